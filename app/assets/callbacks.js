@@ -0,0 +1,76 @@
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    ui: {
+        normalize_date_range: function (selectedDataset, yearRanges, startDate, endDate) {
+            const dateRange = (yearRanges || {})[selectedDataset];
+            if (!dateRange || dateRange.length === 0) {
+                // Datasets are still loading
+                return Array(2).fill(window.dash_clientside.no_update);
+            }
+
+            if (startDate === null || startDate === undefined || !dateRange.includes(startDate)) {
+                startDate = dateRange[0];
+            }
+            if (endDate === null || endDate === undefined || !dateRange.includes(endDate) || endDate < startDate) {
+                endDate = dateRange[dateRange.length - 1];
+            }
+
+            return [startDate, endDate];
+        },
+
+        update_date_range: function (startDate, endDate, selectedDataset, yearRanges) {
+            const dateRange = (yearRanges || {})[selectedDataset];
+            if (!dateRange || dateRange.length === 0 || startDate === null || startDate === undefined
+                || endDate === null || endDate === undefined) {
+                return Array(7).fill(window.dash_clientside.no_update);
+            }
+
+            const minDate = dateRange[0];
+            const maxDate = dateRange[dateRange.length - 1];
+            const toOption = (year) => ({label: String(year), value: year});
+            const dateRangeOptionsStart = dateRange.filter((year) => year <= endDate).map(toOption);
+            const dateRangeOptionsEnd = dateRange.filter((year) => year >= startDate).map(toOption);
+
+            const marks = {};
+            [startDate, endDate, minDate, maxDate].forEach((date) => {
+                marks[String(date)] = String(date);
+            });
+
+            return [
+                dateRangeOptionsStart, dateRangeOptionsEnd, minDate, maxDate, marks, [startDate, endDate],
+                {dataset: selectedDataset, start: startDate, end: endDate},
+            ];
+        },
+
+        update_graph_types: function (viewType) {
+            const graphTypes = [
+                {label: "Line", value: "line"},
+                {label: "Bar", value: "bar"},
+                {label: "Heatmap", value: "heatmap", disabled: viewType === "general"},
+            ];
+
+            return [graphTypes, graphTypes, "line", viewType === "general" ? "bar" : "heatmap"];
+        },
+
+        filter_graph_zoom: function (valueRelayout, trendsRelayout) {
+            const triggered = window.dash_clientside.callback_context.triggered[0].prop_id;
+            const relayout = (triggered.startsWith("disp-graph-data-value.") ? valueRelayout : trendsRelayout) || {};
+            const zoomed = "xaxis.range[0]" in relayout && "xaxis.range[1]" in relayout;
+            return zoomed || relayout["xaxis.autorange"] ? relayout : window.dash_clientside.no_update;
+        },
+
+        update_export_link: function (selection, exportFormat) {
+            if (!selection) {
+                return null;
+            }
+
+            const config = JSON.parse(document.getElementById("_dash-config").textContent);
+            const query = new URLSearchParams({start: selection.start, end: selection.end});
+            return `${config.requests_pathname_prefix}export/${selection.dataset}.${exportFormat}?${query}`;
+        },
+
+        measure_graph_width: function (graphId) {
+            const graph = document.getElementById(graphId);
+            return graph ? graph.offsetWidth : null;
+        },
+    },
+});
@@ -0,0 +1,185 @@
+import gzip
+import mimetypes
+import os
+import sys
+from pathlib import Path
+from typing import Dict
+from typing import Iterator
+from typing import Optional
+from typing import Tuple
+
+import flask
+from dash.fingerprint import check_fingerprint
+from werkzeug.security import safe_join
+
+from app.config import config_file
+from app.config import load_config
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+__all__ = ['asset_url', 'compress', 'install_compression', 'precompress']
+
+# Text and fonts shrink by a half or more, images and archives are compressed already. Source maps are left out,
+# only the developer tools fetch them and they would double the build time
+compressible_suffixes = ('.css', '.js', '.json', '.otf', '.svg', '.ttf', '.txt')
+# Best first: brotli is the smaller of the two when the client takes it and the module is installed
+encodings = (('br', '.br'), ('gzip', '.gz')) if brotli is not None else (('gzip', '.gz'),)
+immutable = 'public, max-age=31536000, immutable'
+# Static files are compressed once at build time, as small as it gets. Responses are compressed per request, and
+# callback payloads are mostly base64 floats: past these levels the time goes up several times for 1-2% in size
+build_levels = {'br': 11, 'gzip': 9}
+response_levels = {'br': 4, 'gzip': 1}
+dynamic_mimetypes = ('application/json', 'text/html')
+
+
+def compress(data: bytes, encoding: str, level: int) -> bytes:
+    return brotli.compress(data, quality=level) if encoding == 'br' else gzip.compress(data, level, mtime=0)
+
+
+def __static_files(app) -> Iterator[Tuple[str, Path]]:
+    # URL path below the routes prefix -> file, for the assets and the component suite files Dash may serve
+    assets_folder = Path(app.config.assets_folder)
+    for path in sorted(assets_folder.rglob('*')):
+        if path.is_file() and not any(part.startswith('.') for part in path.relative_to(assets_folder).parts):
+            yield f'{app.config.assets_url_path.strip("/")}/{path.relative_to(assets_folder).as_posix()}', path
+
+    # Rendering the index registers every bundle of the loaded component libraries, async chunks included
+    with app.server.test_request_context():
+        app.index()
+    for package, paths in sorted(app.registered_paths.items()):
+        for path in sorted(paths):
+            yield f'_dash-component-suites/{package}/{path}', __package_file(package, path)
+
+
+def __package_file(package: str, path: str) -> Path:
+    return Path(os.path.dirname(sys.modules[package].__file__)) / path
+
+
+def precompress(app, directory: Path) -> Dict[str, Tuple[int, Dict[str, int]]]:
+    # Writes <directory>/<url path>.br and .gz next to each other, skipping variants that would not be smaller
+    sizes = {}
+    for url_path, path in __static_files(app):
+        if path.suffix not in compressible_suffixes or not path.exists():
+            continue
+
+        data = path.read_bytes()
+        sizes[url_path] = (len(data), {})
+        for encoding, suffix in encodings:
+            target = directory / f'{url_path}{suffix}'
+            compressed = compress(data, encoding, build_levels[encoding])
+            if len(compressed) >= len(data):
+                target.unlink(missing_ok=True)
+                continue
+
+            target.parent.mkdir(parents=True, exist_ok=True)
+            target.write_bytes(compressed)
+            sizes[url_path][1][encoding] = len(compressed)
+
+    return sizes
+
+
+def asset_url(app, path: str) -> str:
+    # Like app.get_asset_url, with the ?m= fingerprint Dash gives the stylesheets and scripts it links itself
+    modified = int(os.stat(Path(app.config.assets_folder) / path).st_mtime)
+    return f'{app.get_asset_url(path)}?m={modified}'
+
+
+def __accepts(encoding: str) -> bool:
+    return flask.request.accept_encodings[encoding] > 0 and (encoding != 'br' or brotli is not None)
+
+
+def install_compression(
+        app, enabled: bool = True, directory: str = '.precompressed', min_size: int = 1024,
+) -> None:
+    if not enabled:
+        return
+
+    server = app.server
+    directory = str(config_file.parent / directory)
+    routes_prefix = app.config.routes_pathname_prefix
+    assets_prefix = f'{routes_prefix}{app.config.assets_url_path.strip("/")}/'
+    suites_prefix = f'{routes_prefix}_dash-component-suites/'
+
+    def static_file() -> Optional[Tuple[str, Path, bool]]:
+        # URL path below the routes prefix, the file it serves, and whether the URL changes with the file
+        path = flask.request.path
+        if path.startswith(assets_prefix):
+            relative = path[len(assets_prefix):]
+            return path[len(routes_prefix):], Path(app.config.assets_folder) / relative, 'm' in flask.request.args
+        if path.startswith(suites_prefix):
+            package, _, fingerprinted_path = path[len(suites_prefix):].partition('/')
+            path_in_package, has_fingerprint = check_fingerprint(fingerprinted_path)
+            if package not in app.registered_paths or path_in_package not in app.registered_paths[package]:
+                return None
+            url_path = f'_dash-component-suites/{package}/{path_in_package}'
+            return url_path, __package_file(package, path_in_package), has_fingerprint
+        return None
+
+    @server.before_request
+    def serve_precompressed() -> Optional[flask.Response]:
+        if flask.request.method not in ('GET', 'HEAD') or (static := static_file()) is None:
+            return None
+
+        url_path, source, fingerprinted = static
+        for encoding, suffix in encodings:
+            if not __accepts(encoding) or (compressed := safe_join(directory, url_path + suffix)) is None:
+                continue
+            # A variant older than its source is left over from a previous build
+            try:
+                if os.stat(compressed).st_mtime < os.stat(source).st_mtime:
+                    continue
+            except OSError:
+                continue
+
+            response = flask.send_file(
+                compressed, mimetype=mimetypes.guess_type(url_path)[0] or 'application/octet-stream',
+                conditional=True, etag=True,
+            )
+            response.headers['Content-Encoding'] = encoding
+            return response
+        return None
+
+    @server.after_request
+    def compress_response(response: flask.Response) -> flask.Response:
+        if (static := static_file()) is not None:
+            if response.status_code not in (200, 206, 304):
+                return response
+            # Fingerprinted URLs change whenever the file does, anything else is revalidated against its ETag
+            response.headers['Cache-Control'] = immutable if static[2] else 'no-cache'
+            response.vary.add('Accept-Encoding')
+            return response
+
+        # Callback responses, the layout, the dependencies and the page itself, compressed when they are big enough
+        if (
+                response.mimetype not in dynamic_mimetypes or response.status_code != 200
+                or response.direct_passthrough or response.is_streamed or 'Content-Encoding' in response.headers
+        ):
+            return response
+
+        response.vary.add('Accept-Encoding')
+        data = response.get_data()
+        if len(data) < min_size:
+            return response
+        for encoding, _ in encodings:
+            if __accepts(encoding):
+                response.set_data(compress(data, encoding, response_levels[encoding]))
+                response.headers['Content-Encoding'] = encoding
+                break
+        return response
+
+
+if __name__ == '__main__':
+    from app.main import app as dash_app
+
+    output = config_file.parent / load_config().get('compression', {}).get('directory', '.precompressed')
+    total, compressed_total = 0, {encoding: 0 for encoding, _ in encodings}
+    for url_path, (size, compressed_sizes) in precompress(dash_app, output).items():
+        total += size
+        for encoding in compressed_total:
+            compressed_total[encoding] += compressed_sizes.get(encoding, size)
+    print(f"Precompressed static files into {output}: {total:,} B -> " + ', '.join(
+        f"{size:,} B {encoding}" for encoding, size in compressed_total.items()
+    ))
@@ -0,0 +1,17 @@
+import os
+import tomllib
+from functools import cache
+from pathlib import Path
+
+__all__ = ['config_file', 'load_config']
+
+config_file = Path(os.environ.get('APP_CONFIG_FILE', Path(__file__).parent.parent / 'app_config.toml'))
+
+
+@cache
+def load_config() -> dict:
+    if config_file.exists():
+        with open(config_file, 'rb') as fb:
+            return tomllib.load(fb)
+
+    return {}
@@ -0,0 +1,106 @@
+import io
+from typing import Iterator
+from typing import Sequence
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+from pyarrow import csv
+from pyarrow import parquet
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+__all__ = ['export_formats', 'iter_export']
+
+# Format -> label, mimetype
+export_formats = {
+    'csv': ('CSV', 'text/csv'),
+    'jsonl': ('JSON Lines', 'application/x-ndjson'),
+    'parquet': ('Parquet', 'application/vnd.apache.parquet'),
+}
+
+
+class __StreamSink(io.RawIOBase):
+    # Collects what was written since the last drain. Positions keep counting from the start of the file, as a
+    # Parquet footer records its row groups by offset
+    def __init__(self) -> None:
+        super().__init__()
+        self.__chunks = []
+        self.__position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self.__chunks.append(bytes(data))
+        self.__position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self.__position
+
+    def drain(self) -> bytes:
+        data = b''.join(self.__chunks)
+        self.__chunks.clear()
+        return data
+
+
+def __chunks(dataframe: pd.DataFrame, columns: Sequence[str], chunk_rows: int) -> Iterator[pd.DataFrame]:
+    # Rows are sliced first, a view, so that taking the columns only copies the chunk rather than the whole frame
+    positions = [dataframe.columns.get_loc(column) for column in columns]
+    for start in range(0, len(dataframe), chunk_rows):
+        yield dataframe.iloc[start:start + chunk_rows].iloc[:, positions]
+
+
+def __arrow(dataframe: pd.DataFrame, columns: Sequence[str], chunk_rows: int, writer_type) -> Iterator[bytes]:
+    # Arrow's writers format a chunk at a time into the sink, which hands on what they wrote as soon as they did
+    sink = __StreamSink()
+    schema = pa.Schema.from_pandas(dataframe.iloc[:0][list(columns)], preserve_index=False)
+    with writer_type(sink, schema) as writer:
+        for chunk in __chunks(dataframe, columns, chunk_rows):
+            writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+            yield sink.drain()
+    yield sink.drain()
+
+
+def __csv(dataframe: pd.DataFrame, columns: Sequence[str], chunk_rows: int) -> Iterator[bytes]:
+    return __arrow(dataframe, columns, chunk_rows, csv.CSVWriter)
+
+
+def __jsonl(dataframe: pd.DataFrame, columns: Sequence[str], chunk_rows: int) -> Iterator[bytes]:
+    # float32 values are written in their shortest repr, 4.2 as Arrow writes it to CSV rather than 4.1999998093
+    if orjson is None:
+        for chunk in __chunks(dataframe, columns, chunk_rows):
+            chunk = chunk.assign(**{
+                column: chunk[column].to_numpy().astype(str).astype(np.float64)
+                for column in chunk.columns[chunk.dtypes == np.float32]
+            })
+            yield chunk.to_json(orient='records', lines=True, double_precision=15).rstrip('\n').encode() + b'\n'
+        return
+
+    # orjson encodes a column at once, its values are then joined row by row
+    keys = [orjson.dumps(column) + b':' for column in columns]
+    for chunk in __chunks(dataframe, columns, chunk_rows):
+        values = [
+            orjson.dumps(np.ascontiguousarray(chunk.iloc[:, position]), option=orjson.OPT_SERIALIZE_NUMPY)[1:-1]
+            .split(b',')
+            for position in range(len(columns))
+        ]
+        yield b''.join(
+            b'{' + b','.join(key + value for key, value in zip(keys, row)) + b'}\n' for row in zip(*values)
+        )
+
+
+def __parquet(dataframe: pd.DataFrame, columns: Sequence[str], chunk_rows: int) -> Iterator[bytes]:
+    # A row group per chunk
+    return __arrow(dataframe, columns, chunk_rows, parquet.ParquetWriter)
+
+
+def iter_export(
+        dataframe: pd.DataFrame, columns: Sequence[str], export_format: str, chunk_rows: int = 10000,
+) -> Iterator[bytes]:
+    writers = {'csv': __csv, 'jsonl': __jsonl, 'parquet': __parquet}
+    return writers[export_format](dataframe, columns, max(chunk_rows, 1))
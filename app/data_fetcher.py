@@ -0,0 +1,203 @@
+import codecs
+import hashlib
+import json
+import math
+import re
+import time
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Dict
+from typing import Iterator
+from typing import List
+from typing import Optional
+from typing import Tuple
+
+import numpy as np
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+try:
+    from orjson import loads as json_loads
+except ImportError:
+    from json import loads as json_loads
+
+__all__ = ['DataFetcher', 'DatasetIndex']
+
+__whitespace = re.compile(r'[ \t\n\r]*')
+
+
+@dataclass
+class DatasetIndex:
+    rows: int
+    # sha256 of the response body, and of the rows as canonical JSON, in full and up to the checkpoint row
+    body_digest: str
+    digest: str
+    prefix_digest: Optional[str]
+    # Schema column -> API field, the values of rows embedded in the index, and the rows still to fetch by URI
+    fields: Dict[str, str]
+    columns: Dict[str, np.ndarray]
+    pending: List[Tuple[int, str]]
+
+
+def __skip_whitespace(text: str, position: int) -> int:
+    return __whitespace.match(text, position).end()
+
+
+def __with_end(chunks: Iterator[bytes]) -> Iterator[Optional[bytes]]:
+    yield from chunks
+    yield None
+
+
+def iter_json_list(chunks: Iterator[bytes]) -> Iterator:
+    # Elements of a JSON array, decoded one at a time as the chunks arrive instead of from the whole body
+    decoder, text = json.JSONDecoder(), codecs.getincrementaldecoder('utf-8')()
+    buffer, position, expect = '', 0, '['
+
+    for chunk in __with_end(chunks):
+        final = chunk is None
+        buffer = buffer[position:] + text.decode(b'' if final else chunk, final=final)
+        position = 0
+
+        while (position := __skip_whitespace(buffer, position)) < len(buffer):
+            character = buffer[position]
+            if expect in ('[', ',') and character == expect:
+                position, expect = position + 1, 'value' if expect == ',' else 'first'
+            elif expect in ('first', ',') and character == ']':
+                position, expect = position + 1, 'end'
+            elif expect in ('first', 'value'):
+                try:
+                    element, end = decoder.raw_decode(buffer, position)
+                except json.JSONDecodeError:
+                    if final:
+                        raise
+                    break
+
+                # Only a delimiter after it proves a number was not cut short by the chunk boundary
+                if not final and (end == len(buffer) or buffer[end] not in ' \t\n\r,]'):
+                    break
+                yield element
+                position, expect = end, ','
+            else:
+                message = "Extra data" if expect == 'end' else f"Expecting '{expect}'"
+                raise json.JSONDecodeError(message, buffer, position)
+
+    if expect != 'end':
+        raise json.JSONDecodeError("Unterminated list", buffer, position)
+
+
+class DataFetcher:
+    retry_status_codes = (429, 500, 502, 503, 504)
+
+    def __init__(
+            self, max_workers: int = 16, timeout: float = 10.0, retries: int = 3, backoff_factor: float = 0.2,
+    ) -> None:
+        self.max_workers = max(max_workers, 1)
+        self.timeout = timeout
+        self.timings: Dict[str, float] = {}
+
+        retry = Retry(
+            total=retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=self.retry_status_codes,
+            allowed_methods=frozenset({'GET'}),
+        )
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=self.max_workers, max_retries=retry)
+
+        self.__session = requests.Session()
+        self.__session.mount('http://', adapter)
+        self.__session.mount('https://', adapter)
+
+    def get(self, url: str) -> requests.Response:
+        response = self.__session.get(url, timeout=self.timeout)
+        response.raise_for_status()
+        return response
+
+    @staticmethod
+    def parse_json(response: requests.Response):
+        # Fails like Response.json() on a malformed body, so callers keep treating it as a fetch error
+        try:
+            return json_loads(response.content)
+        except ValueError as e:
+            raise requests.exceptions.JSONDecodeError(str(e), response.text, 0)
+
+    @staticmethod
+    def __number(value) -> float:
+        try:
+            return float(value)
+        except (TypeError, ValueError):
+            return math.nan
+
+    def fetch_index(self, url: str, fields: Dict[str, str], checkpoint: int = 0) -> DatasetIndex:
+        # Rows embedded in the list go straight into typed columns as they are decoded, the others are left for
+        # fetch_dataset. Neither the body nor a dict per row is held in memory
+        body_digest, digest, prefix_digest = hashlib.sha256(), hashlib.sha256(b'['), None
+        values = {column: array('d') for column in fields}
+        pending = []
+        rows = 0
+
+        def chunks() -> Iterator[bytes]:
+            for chunk in response.iter_content(chunk_size=2 ** 16):
+                body_digest.update(chunk)
+                yield chunk
+
+        with self.__session.get(url, timeout=self.timeout, stream=True) as response:
+            response.raise_for_status()
+            try:
+                for row in iter_json_list(chunks()):
+                    # Same digests as json.dumps(index, sort_keys=True) over the whole list and its first rows
+                    if rows == checkpoint:
+                        prefix_digest = self.__closed_digest(digest)
+                    encoded = json.dumps(row, sort_keys=True).encode()
+                    digest.update(b', ' + encoded if rows else encoded)
+
+                    # A row is embedded when it has every field, a reference such as {"id", "uri"} is fetched
+                    carries_row = all(field in row for field in fields.values())
+                    if not carries_row and 'uri' not in row:
+                        raise ValueError(f"row {rows} has neither the fields {sorted(fields.values())} nor a uri")
+                    for column, field in fields.items():
+                        values[column].append(self.__number(row[field]) if carries_row else math.nan)
+                    if not carries_row:
+                        pending.append((rows, row['uri']))
+                    rows += 1
+            except (ValueError, TypeError, AttributeError) as e:
+                raise requests.exceptions.JSONDecodeError(f"Malformed dataset index at {url}: {e}", '', 0)
+
+        if rows == checkpoint:
+            prefix_digest = self.__closed_digest(digest)
+
+        return DatasetIndex(
+            rows=rows,
+            body_digest=body_digest.hexdigest(),
+            digest=self.__closed_digest(digest),
+            prefix_digest=prefix_digest,
+            fields=fields,
+            columns={column: np.frombuffer(buffer, dtype=np.float64) for column, buffer in values.items()},
+            pending=pending,
+        )
+
+    @staticmethod
+    def __closed_digest(digest) -> str:
+        closed = digest.copy()
+        closed.update(b']')
+        return closed.hexdigest()
+
+    def fetch_dataset(self, name: str, index: DatasetIndex, start: int = 0) -> Dict[str, np.ndarray]:
+        # Columns of the rows from `start` on, fetching by URI the ones the index did not embed
+        begin = time.perf_counter()
+
+        def store(position: int, uri: str) -> None:
+            row = self.parse_json(self.get(uri))
+            for column, field in index.fields.items():
+                index.columns[column][position] = self.__number(row.get(field))
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            for _ in executor.map(lambda item: store(*item), [item for item in index.pending if item[0] >= start]):
+                pass
+
+        self.timings[name] = time.perf_counter() - begin
+        return {column: values[start:] for column, values in index.columns.items()}
+
+    def close(self) -> None:
+        self.__session.close()
@@ -1,41 +1,123 @@
+import hashlib
 import os
-import tomllib
-from pathlib import Path
+import threading
+import time
+import traceback
+from dataclasses import dataclass
+from dataclasses import field
+from types import MappingProxyType
 from typing import Dict
+from typing import Iterable
+from typing import Mapping
+from typing import Optional
+from typing import Tuple
 
+import numpy as np
 import pandas as pd
 import requests
 
-__all__ = ['datasets', 'datasets_label']
+from app.config import config_file
+from app.config import load_config
+from app.data_fetcher import DataFetcher
+from app.data_fetcher import DatasetIndex
+from app.data_schema import fractional_years
+from app.data_schema import materialize_columns
+from app.data_schema import prepare_dataset
+from app.data_schema import schemas
+from app.data_snapshot import DataSnapshot
+from app.metrics import dataset_load_duration
+from app.metrics import dataset_load_failures
+from app.metrics import dataset_rows
+from app.metrics import dataset_version
+from app.range_stats import RangeStats
+from app.year_index import YearIndex
+
+__all__ = ['DatasetVersion', 'data_provider', 'datasets_label']
+
+
+@dataclass(frozen=True)
+class DatasetVersion:
+    version: int
+    datasets: Mapping[str, pd.DataFrame]
+    # Digest of the frames, the same in every worker that published the same data
+    content_key: str = ''
+    fingerprint: Optional[dict] = None
+    # Row count and digest of the API index rows each dataset was built from
+    sources: Mapping[str, Tuple[int, str]] = field(default_factory=dict)
+    year_indexes: Mapping[str, YearIndex] = field(default_factory=dict)
+    # Per-year prefix sums and sparse tables of the value columns, any year range summarized in constant time
+    range_stats: Mapping[str, RangeStats] = field(default_factory=dict)
+    # Published frames plus the derived columns asked for so far, memoized for the lifetime of the version
+    materialized: Dict[str, pd.DataFrame] = field(default_factory=dict, compare=False, repr=False)
+    materialize_lock: threading.Lock = field(default_factory=threading.Lock, compare=False, repr=False)
+
+    def frame(self, dataset: str, columns: Iterable[str] = ()) -> pd.DataFrame:
+        columns = tuple(columns)
+        dataframe = self.materialized.get(dataset, self.datasets[dataset])
+        if all(column in dataframe for column in columns):
+            return dataframe
+
+        with self.materialize_lock:
+            dataframe = materialize_columns(dataset, self.materialized.get(dataset, self.datasets[dataset]), columns)
+            self.materialized[dataset] = dataframe
+        return dataframe
+
+    def year_range(self, dataset: str, start_year: int, end_year: int, columns: Iterable[str] = ()) -> pd.DataFrame:
+        # A positional slice is a view of the frame, no mask or copy involved
+        start, stop = self.year_indexes[dataset].bounds(start_year, end_year)
+        return self.frame(dataset, columns).iloc[start:stop]
 
 
 class DataProvider:
-    config_file = Path(__file__).parent.parent / 'app_config.toml'
+    config_file = config_file
     data_api_hello_endpoint = '{api_server}/api/v1'
     data_api_endpoints_base = {
         'housing_data': '{api_server}/api/v1/dataset/housing',
         'travel_data': '{api_server}/api/v1/dataset/travel',
         'lm_data': '{api_server}/api/v1/dataset/labour-market',
     }
+    # API field names of the schema columns the API names differently
+    api_fields = {
+        'lm_data': {'year': 'quarter_mid_y', 'month': 'quarter_mid_m'},
+    }
 
     def __init__(self) -> None:
-        self.__datasets: Dict[str, pd.DataFrame] = {}
+        self.__current = DatasetVersion(version=0, datasets=MappingProxyType({}))
+        self.__error: Optional[str] = None
+        self.__loaded = threading.Event()
+        self.__refresh_lock = threading.Lock()
+        self.__loader_lock = threading.Lock()
+        self.__loader: Optional[threading.Thread] = None
 
-        self.__load_data()
-        self.__preprocess_data()
+        # Threads do not survive a fork, let every gunicorn worker start its own loader
+        os.register_at_fork(after_in_child=self.__reset_loader)
+
+    @property
+    def current(self) -> DatasetVersion:
+        # Version 0 holds no datasets, it is what callers see until the first load completes
+        self.start()
+        return self.__current
 
     @property
-    def datasets(self) -> Dict[str, pd.DataFrame]:
-        return self.__datasets
+    def ready(self) -> bool:
+        return self.__current.version > 0
 
-    def _load_api_server_url(self) -> str:
+    @property
+    def error(self) -> Optional[str]:
+        return self.__error
+
+    @property
+    def datasets(self) -> Mapping[str, pd.DataFrame]:
+        return self.current.datasets
+
+    def _load_config(self) -> dict:
+        return load_config()
+
+    def _load_api_server_url(self, config: dict) -> str:
         if 'BACKEND_SERVER_URL' in os.environ:
             return os.environ['BACKEND_SERVER_URL']
 
-        if self.config_file.exists():
-            with open(self.config_file, 'rb') as fb:
-                config = tomllib.load(fb)
-        else:
+        if not self.config_file.exists():
             raise FileNotFoundError("App Start Failed: Config file not found")
 
         if 'api_server' not in config:
@@ -43,70 +125,289 @@ class DataProvider:
 
         return config['api_server']
 
-    def __load_datasets(self, api_server) -> None:
+    def __fetch_fingerprint(
+            self, fetcher: DataFetcher, checkpoints: Optional[Mapping[str, int]] = None,
+    ) -> Tuple[dict, Dict[str, DatasetIndex]]:
         try:
-            response = requests.get(self.data_api_hello_endpoint.format(api_server=api_server))
-            response.raise_for_status()
+            response = fetcher.get(self.data_api_hello_endpoint.format(api_server=self.__api_server))
         except requests.RequestException:
             raise requests.RequestException(
-                f"App Start Failed: Cannot connect to API Server at {api_server}"
+                f"Cannot connect to API Server at {self.__api_server}"
             )
 
-        data_api_endpoints = {
-            dataset: url.format(api_server=api_server)
-            for dataset, url in self.data_api_endpoints_base.items()
+        fingerprint = {
+            'api': (
+                    response.headers.get('ETag')
+                    or response.headers.get('Last-Modified')
+                    or hashlib.sha256(response.content).hexdigest()
+            ),
+            'datasets': {},
         }
+        indexes = {}
+
+        for dataset, url in self.data_api_endpoints_base.items():
+            url = url.format(api_server=self.__api_server)
+            renamed = self.api_fields.get(dataset, {})
+            fields = {
+                column: renamed.get(column, column)
+                for column in (*schemas[dataset]['keys'], *schemas[dataset]['values'])
+            }
 
-        for dataset, url in data_api_endpoints.items():
             try:
-                response = requests.get(url)
-                response.raise_for_status()
+                indexes[dataset] = fetcher.fetch_index(url, fields, (checkpoints or {}).get(dataset, 0))
             except requests.RequestException:
                 raise requests.RequestException(
-                    f"App Start Failed: Cannot fetch data from {url}"
+                    f"Cannot fetch data from {url}"
                 )
 
-            self.__datasets[dataset] = pd.DataFrame(
-                requests.get(row['uri']).json() for row in response.json()
-            )
+            fingerprint['datasets'][dataset] = {
+                'rows': indexes[dataset].rows,
+                'digest': indexes[dataset].body_digest,
+            }
 
-    def __load_data(self) -> None:
+        return fingerprint, indexes
+
+    @staticmethod
+    def __fetch_rows(dataset: str, index: DatasetIndex, fetcher: DataFetcher, start: int = 0) -> pd.DataFrame:
         try:
-            api_server = self._load_api_server_url()
-            self.__load_datasets(api_server)
-        except (FileNotFoundError, ValueError, requests.RequestException) as e:
-            print(e)
-            exit(1)
+            columns = fetcher.fetch_dataset(dataset, index, start)
+        except requests.RequestException:
+            raise requests.RequestException(
+                f"Cannot fetch data rows of {dataset}"
+            )
 
-    def __preprocess_data(self) -> None:
-        self.__datasets['lm_data'].rename(columns={
-            'quarter_mid_y': 'year',
-            'quarter_mid_m': 'month',
-        }, inplace=True)
+        return pd.DataFrame(columns)
 
-        self.__datasets['travel_data']['annual_growth_bus'] = (
-            self.__datasets['travel_data']['bus_journeys'].pct_change(13)
-        )
-        self.__datasets['travel_data']['annual_growth_tube'] = (
-            self.__datasets['travel_data']['tube_journeys'].pct_change(13)
-        )
+    @staticmethod
+    def __content_key(datasets: Mapping[str, pd.DataFrame]) -> str:
+        digest = hashlib.sha256()
+        for dataset, dataframe in sorted(datasets.items()):
+            for column in dataframe.columns:
+                values = np.ascontiguousarray(dataframe[column].to_numpy())
+                digest.update(f'{dataset}.{column}:{values.dtype}:{len(values)};'.encode())
+                digest.update(values)
+        return digest.hexdigest()
 
-        self.__datasets['lm_data']['annual_growth_ldn'] = (
-            self.__datasets['lm_data']['unemployment_rate_ldn'].pct_change(12)
-        )
-        self.__datasets['lm_data']['annual_growth_uk'] = (
-            self.__datasets['lm_data']['unemployment_rate_uk'].pct_change(12)
+    @staticmethod
+    def __range_stats(dataset: str, dataframe: pd.DataFrame) -> RangeStats:
+        return RangeStats(
+            dataframe['year'].to_numpy(),
+            fractional_years(dataset, dataframe),
+            {column: dataframe[column].to_numpy() for column in schemas[dataset]['values']},
         )
 
-        self.__datasets['travel_data']['total_journeys'] = (
-                self.__datasets['travel_data']['bus_journeys'] + self.__datasets['travel_data']['tube_journeys']
+    def __publish(
+            self,
+            datasets: Dict[str, pd.DataFrame],
+            fingerprint: Optional[dict],
+            indexes: Optional[Dict[str, DatasetIndex]],
+            save: bool = True,
+    ) -> None:
+        sources = {dataset: (index.rows, index.digest) for dataset, index in (indexes or {}).items()}
+
+        if self.__snapshot is not None and fingerprint is not None and save:
+            try:
+                self.__snapshot.save(datasets, fingerprint)
+            except OSError as e:
+                print(f"Cannot write dataset snapshot: {e}")
+
+            # Swap the private copies for views over the snapshot, which may also have been written by another worker
+            if self.__snapshot.memory_map and (mapped := self.__snapshot.load(fingerprint)) is not None:
+                datasets = mapped
+
+        # Frames are never modified once published, so swapping the reference is all a reader can observe
+        self.__current = DatasetVersion(
+            version=self.__current.version + 1,
+            datasets=MappingProxyType(dict(datasets)),
+            content_key=self.__content_key(datasets),
+            fingerprint=fingerprint,
+            sources=MappingProxyType(sources),
+            year_indexes=MappingProxyType({
+                dataset: (
+                    self.__current.year_indexes[dataset]
+                    if self.__current.datasets.get(dataset) is dataframe
+                    else YearIndex(dataframe['year'].to_numpy())
+                )
+                for dataset, dataframe in datasets.items()
+            }),
+            range_stats=MappingProxyType({
+                dataset: (
+                    self.__current.range_stats[dataset]
+                    if self.__current.datasets.get(dataset) is dataframe
+                    else self.__range_stats(dataset, dataframe)
+                )
+                for dataset, dataframe in datasets.items()
+            }),
         )
-        self.__datasets['travel_data']['annual_growth_total'] = (
-            self.__datasets['travel_data']['total_journeys'].pct_change(13)
+
+        dataset_version.set(self.__current.version)
+        for dataset, dataframe in datasets.items():
+            dataset_rows.labels(dataset).set(len(dataframe))
+
+    def __load_data(self) -> None:
+        config = self._load_config()
+        self.__api_server = self._load_api_server_url(config)
+
+        snapshot_config = config.get('snapshot', {})
+        self.__snapshot = (
+            DataSnapshot(
+                self.config_file.parent / snapshot_config.get('directory', '.snapshot'),
+                memory_map=snapshot_config.get('memory_map', False),
+            )
+            if snapshot_config.get('enabled', True) else None
         )
+        self.__fetch_config = config.get('fetch', {})
+        self.__refresh_interval = config.get('refresh', {}).get('interval', 0)
+
+        fetcher = DataFetcher(**self.__fetch_config)
+        start = time.perf_counter()
+        try:
+            fingerprint, indexes = self.__fetch_fingerprint(fetcher)
+
+            if self.__snapshot is not None and (cached := self.__snapshot.load(fingerprint)) is not None:
+                self.__publish(cached, fingerprint, indexes, save=False)
+                dataset_load_duration.labels('startup', 'snapshot').observe(time.perf_counter() - start)
+                print(f"Datasets loaded from snapshot in {time.perf_counter() - start:.2f}s")
+                return
+
+            datasets = {
+                dataset: prepare_dataset(dataset, self.__fetch_rows(dataset, index, fetcher))
+                for dataset, index in indexes.items()
+            }
+        except requests.RequestException as e:
+            # Serve the last snapshot, however stale, rather than failing while the backend is down
+            if self.__snapshot is not None and (cached := self.__snapshot.load()) is not None:
+                self.__publish(cached, None, None)
+                dataset_load_duration.labels('startup', 'stale_snapshot').observe(time.perf_counter() - start)
+                print(f"{e}, serving datasets from the last snapshot")
+                return
+
+            raise
+        finally:
+            fetcher.close()
+
+        timings = ', '.join(f'{dataset} {seconds:.2f}s' for dataset, seconds in fetcher.timings.items())
+        print(f"Datasets loaded in {time.perf_counter() - start:.2f}s ({timings})")
+
+        self.__publish(datasets, fingerprint, indexes)
+        dataset_load_duration.labels('startup', 'api').observe(time.perf_counter() - start)
+
+    def refresh(self) -> bool:
+        with self.__refresh_lock:
+            current = self.__current
+
+            fetcher = DataFetcher(**self.__fetch_config)
+            try:
+                fingerprint, indexes = self.__fetch_fingerprint(fetcher, {
+                    dataset: loaded_rows for dataset, (loaded_rows, _) in current.sources.items()
+                })
+                if fingerprint == current.fingerprint:
+                    return False
+
+                datasets = dict(current.datasets)
+                updated = False
+                for dataset, index in indexes.items():
+                    loaded_rows, loaded_digest = current.sources.get(dataset, (0, None))
+
+                    if index.rows == loaded_rows and index.digest == loaded_digest:
+                        continue
+
+                    if index.rows > loaded_rows and index.prefix_digest == loaded_digest:
+                        # Append-only release, fetch just the new rows and re-derive from the combined frame
+                        new_rows = self.__fetch_rows(dataset, index, fetcher, start=loaded_rows)
+                        combined = pd.concat([current.datasets[dataset], new_rows], ignore_index=True)
+                    else:
+                        combined = self.__fetch_rows(dataset, index, fetcher)
+
+                    datasets[dataset] = prepare_dataset(dataset, combined)
+                    updated = True
+            finally:
+                fetcher.close()
+
+            if not updated:
+                return False
+
+            self.__publish(datasets, fingerprint, indexes)
+            return True
+
+    def start(self) -> None:
+        # Load in the background, so the server can listen and report readiness in the meantime
+        if self.__loader is None:
+            with self.__loader_lock:
+                if self.__loader is None:
+                    self.__loader = threading.Thread(target=self.__run, name='dataset-loader', daemon=True)
+                    self.__loader.start()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        # Also returns when the loader gave up on a broken config, which is never ready
+        self.start()
+        return self.__loaded.wait(timeout) and self.ready
+
+    def __run(self) -> None:
+        try:
+            self._load_api_server_url(self._load_config())
+        except (FileNotFoundError, ValueError) as e:
+            # A broken config will not fix itself, report it on /readyz instead of retrying
+            self.__error = str(e)
+            print(e)
+            self.__loaded.set()
+            return
+
+        # Retry the first load until it succeeds, a backend outage or a bad payload at boot only delays readiness
+        delay = 1
+        while not self.ready:
+            try:
+                self.__load_data()
+            except Exception as e:
+                dataset_load_failures.labels('startup').inc()
+                self.__error = f"Cannot load datasets: {e}"
+                print(f"{self.__error}, retrying in {delay}s")
+                if not isinstance(e, requests.RequestException):
+                    traceback.print_exc()
+                time.sleep(delay)
+                delay = min(delay * 2, 60)
+
+        self.__error = None
+        self.__loaded.set()
+
+        if self.__refresh_interval > 0:
+            self.__refresh_loop()
+
+    def __refresh_loop(self) -> None:
+        # Any failure keeps the last version published and backs off, up to eight intervals between attempts
+        delay = self.__refresh_interval
+        while True:
+            time.sleep(delay)
+
+            start = time.perf_counter()
+            try:
+                refreshed = self.refresh()
+                dataset_load_duration.labels('refresh', 'api' if refreshed else 'unchanged').observe(
+                    time.perf_counter() - start
+                )
+                if refreshed:
+                    print(
+                        f"Datasets refreshed to version {self.__current.version} "
+                        f"in {time.perf_counter() - start:.2f}s"
+                    )
+                delay = self.__refresh_interval
+            except Exception as e:
+                dataset_load_failures.labels('refresh').inc()
+                delay = min(delay * 2, self.__refresh_interval * 8)
+                print(f"Dataset refresh failed: {e}, retrying in {delay}s")
+                if not isinstance(e, requests.RequestException):
+                    traceback.print_exc()
+
+    def __reset_loader(self) -> None:
+        self.__loaded = threading.Event()
+        if self.ready:
+            self.__loaded.set()
+        self.__refresh_lock = threading.Lock()
+        self.__loader_lock = threading.Lock()
+        self.__loader = None
 
 
-datasets: Dict[str, pd.DataFrame] = DataProvider().datasets
+data_provider = DataProvider()
 datasets_label = {
     'housing_data': 'Housing Data',
     'travel_data': 'Travel Data',
@@ -0,0 +1,129 @@
+from typing import Callable
+from typing import Dict
+from typing import Iterable
+
+import numpy as np
+import pandas as pd
+
+__all__ = ['fractional_years', 'materialize_columns', 'prepare_dataset', 'schemas']
+
+
+def __annual_growth(steps_per_year: int) -> Callable[[np.ndarray], np.ndarray]:
+    # Change against the same month or period a year earlier, NaN where there is no earlier row
+    def annual_growth(values: np.ndarray) -> np.ndarray:
+        growth = np.full(len(values), np.nan)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            growth[steps_per_year:] = values[steps_per_year:] / values[:-steps_per_year] - 1
+        return growth
+
+    return annual_growth
+
+
+# Key columns with the narrowest integer type that holds them, the months or periods in a year, value columns as
+# served by the API, and derived columns with the columns they are computed from, which may themselves be derived
+__housing_schema = {
+    'keys': {'year': np.int16, 'month': np.int8},
+    'steps_per_year': 12,
+    'values': ('value_ldn', 'value_uk', 'annual_growth_ldn', 'annual_growth_uk'),
+    'derived': {},
+}
+
+__travel_schema = {
+    'keys': {'year': np.int16, 'period': np.int8},
+    'steps_per_year': 13,
+    'values': ('bus_journeys', 'tube_journeys'),
+    'derived': {
+        'annual_growth_bus': (('bus_journeys',), __annual_growth(13)),
+        'annual_growth_tube': (('tube_journeys',), __annual_growth(13)),
+        'total_journeys': (('bus_journeys', 'tube_journeys'), np.add),
+        'annual_growth_total': (('total_journeys',), __annual_growth(13)),
+    },
+}
+
+__lm_schema = {
+    'keys': {'year': np.int16, 'month': np.int8},
+    'steps_per_year': 12,
+    'values': ('unemployment_rate_ldn', 'unemployment_rate_uk'),
+    'derived': {
+        'annual_growth_ldn': (('unemployment_rate_ldn',), __annual_growth(12)),
+        'annual_growth_uk': (('unemployment_rate_uk',), __annual_growth(12)),
+    },
+}
+
+schemas = {
+    'housing_data': __housing_schema,
+    'travel_data': __travel_schema,
+    'lm_data': __lm_schema,
+}
+
+
+def __narrow_int(column: pd.Series, dtype: type) -> np.ndarray:
+    values = pd.to_numeric(column).to_numpy()
+    limits = np.iinfo(dtype)
+    if len(values) and (values.min() < limits.min or values.max() > limits.max):
+        return values.astype(np.int64)
+    return values.astype(dtype)
+
+
+def __narrow_float(values: np.ndarray) -> np.ndarray:
+    # float32 when it holds every value to within the precision the graphs are sent with anyway
+    narrowed = values.astype(np.float32)
+    with np.errstate(over='ignore', invalid='ignore'):
+        if np.allclose(narrowed, values, rtol=1e-6, atol=0, equal_nan=True):
+            return narrowed
+    return values
+
+
+def prepare_dataset(dataset: str, dataframe: pd.DataFrame) -> pd.DataFrame:
+    schema = schemas[dataset]
+
+    # Keep rows in chronological order by year then month or period, the year index and the annual lags rely on it
+    keys = list(schema['keys'])
+    if not pd.MultiIndex.from_frame(dataframe[keys]).is_monotonic_increasing:
+        dataframe = dataframe.sort_values(keys, kind='stable', ignore_index=True)
+
+    # Only keys and API values are published, derived columns are materialized on first use
+    columns = {key: __narrow_int(dataframe[key], dtype) for key, dtype in schema['keys'].items()}
+    columns.update({
+        column: __narrow_float(pd.to_numeric(dataframe[column], errors='coerce').to_numpy(dtype=np.float64))
+        for column in schema['values']
+    })
+    return pd.DataFrame(columns)
+
+
+def materialize_columns(dataset: str, dataframe: pd.DataFrame, columns: Iterable[str]) -> pd.DataFrame:
+    derived = schemas[dataset]['derived']
+    computed: Dict[str, np.ndarray] = {}
+
+    def resolve(column: str) -> np.ndarray:
+        if column in computed:
+            return computed[column]
+        if column in dataframe:
+            return dataframe[column].to_numpy(dtype=np.float64)
+        if column not in derived:
+            raise KeyError(column)
+
+        dependencies, compute = derived[column]
+        computed[column] = compute(*(resolve(dependency) for dependency in dependencies))
+        return computed[column]
+
+    for column in columns:
+        resolve(column)
+    if not computed:
+        return dataframe
+
+    # A shallow copy shares the existing columns, memory mapped ones included, and only gains the new ones
+    materialized = dataframe.copy(deep=False)
+    for column, values in computed.items():
+        materialized[column] = __narrow_float(values)
+    return materialized
+
+
+def fractional_years(dataset: str, dataframe: pd.DataFrame) -> np.ndarray:
+    # Time of each row in years, the year plus the share of it before the row's month or period
+    schema = schemas[dataset]
+    step = next(key for key in schema['keys'] if key != 'year')
+    return (
+            dataframe['year'].to_numpy(dtype=np.float64)
+            + (dataframe[step].to_numpy(dtype=np.float64) - 1) / schema['steps_per_year']
+    )
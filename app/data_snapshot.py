@@ -0,0 +1,89 @@
+import json
+import os
+import shutil
+import tempfile
+from pathlib import Path
+from typing import Dict
+from typing import Optional
+
+import pandas as pd
+import pyarrow as pa
+from pyarrow import feather
+
+__all__ = ['DataSnapshot']
+
+
+class DataSnapshot:
+    format_version = 3
+    meta_file = 'meta.json'
+
+    def __init__(self, directory: Path, memory_map: bool = False) -> None:
+        self.directory = Path(directory)
+        self.memory_map = memory_map
+
+    @property
+    def fingerprint(self) -> Optional[dict]:
+        try:
+            with open(self.directory / self.meta_file, 'r') as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        if meta.get('format') != self.format_version:
+            return None
+
+        return meta['fingerprint']
+
+    def load(self, fingerprint: Optional[dict] = None) -> Optional[Dict[str, pd.DataFrame]]:
+        stored_fingerprint = self.fingerprint
+        if stored_fingerprint is None or (fingerprint is not None and fingerprint != stored_fingerprint):
+            return None
+
+        try:
+            return {
+                dataset: self.__read(self.directory / f'{dataset}.arrow')
+                for dataset in stored_fingerprint['datasets']
+            }
+        except OSError:
+            return None
+
+    def __read(self, path: Path) -> pd.DataFrame:
+        if not self.memory_map:
+            return feather.read_feather(path)
+
+        # One block per column keeps numeric columns as read-only views over the mapped file,
+        # so every process attached to the same snapshot shares a single copy in the page cache
+        return feather.read_table(path, memory_map=True).to_pandas(split_blocks=True)
+
+    @staticmethod
+    def __to_table(dataframe: pd.DataFrame) -> pa.Table:
+        # Keep NaN as a float value instead of a null, a column with nulls cannot be mapped zero-copy
+        return pa.table({
+            column: pa.array(dataframe[column].to_numpy(), from_pandas=dataframe[column].dtype == object)
+            for column in dataframe.columns
+        })
+
+    def save(self, datasets: Dict[str, pd.DataFrame], fingerprint: dict) -> None:
+        self.directory.parent.mkdir(parents=True, exist_ok=True)
+
+        # Write into a sibling directory and swap it in, so readers never see a partial snapshot
+        staging = Path(tempfile.mkdtemp(prefix=f'.{self.directory.name}-', dir=self.directory.parent))
+        try:
+            for dataset, dataframe in datasets.items():
+                table = self.__to_table(dataframe)
+                # A single record batch per file, chunked columns would be copied when converted to pandas
+                feather.write_feather(
+                    table, staging / f'{dataset}.arrow', compression='uncompressed', chunksize=max(table.num_rows, 1),
+                )
+
+            with open(staging / self.meta_file, 'w') as f:
+                json.dump({'format': self.format_version, 'fingerprint': fingerprint}, f)
+
+            retired = staging.with_name(f'{staging.name}-retired')
+            if self.directory.exists():
+                os.rename(self.directory, retired)
+            os.rename(staging, self.directory)
+            shutil.rmtree(retired, ignore_errors=True)
+        except OSError:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
@@ -0,0 +1,332 @@
+import fcntl
+import hashlib
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import ExitStack
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any
+from typing import Callable
+from typing import Hashable
+from typing import Iterator
+from typing import Optional
+from typing import Union
+
+import numpy as np
+import pandas as pd
+
+from app.config import config_file
+from app.metrics import figure_cache_lookups
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+__all__ = ['FigureCache', 'RedisFigureStore', 'SharedFigureCache', 'SqliteFigureStore', 'create_figure_cache']
+
+
+def _estimate_bytes(value: Any) -> int:
+    if isinstance(value, (np.ndarray, pd.Series, pd.Index)):
+        return value.nbytes
+    if isinstance(value, dict):
+        return sum(len(key) + _estimate_bytes(item) for key, item in value.items())
+    if isinstance(value, (list, tuple)):
+        return sum(_estimate_bytes(item) for item in value)
+    if isinstance(value, (str, bytes)):
+        return len(value)
+    return 8
+
+
+class FigureCache:
+    def __init__(self, max_entries: int = 256, max_bytes: int = 64 * 2 ** 20) -> None:
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self.__entries: OrderedDict[Hashable, tuple] = OrderedDict()
+        self.__bytes = 0
+        self.__version = None
+        self.__lock = threading.Lock()
+
+    @property
+    def stats(self) -> dict:
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'entries': len(self.__entries),
+            'bytes': self.__bytes,
+        }
+
+    def get_or_compute(self, version: int, key: Hashable, compute: Callable[[], Any]) -> Any:
+        with self.__lock:
+            # Everything cached was built from an older dataset version once a new one shows up
+            if version != self.__version:
+                self.__clear()
+                self.__version = version
+
+            if key in self.__entries:
+                self.__entries.move_to_end(key)
+                self.hits += 1
+                figure_cache_lookups.labels('hit').inc()
+                return self.__entries[key][0]
+
+            self.misses += 1
+            figure_cache_lookups.labels('miss').inc()
+
+        value = compute()
+        size = _estimate_bytes(value)
+
+        with self.__lock:
+            if version == self.__version and size <= self.max_bytes and key not in self.__entries:
+                self.__entries[key] = (value, size)
+                self.__bytes += size
+                self.__evict()
+
+        return value
+
+    def clear(self) -> None:
+        with self.__lock:
+            self.__clear()
+
+    def __clear(self) -> None:
+        self.__entries.clear()
+        self.__bytes = 0
+
+    def __evict(self) -> None:
+        while len(self.__entries) > self.max_entries or self.__bytes > self.max_bytes:
+            _, (_, size) = self.__entries.popitem(last=False)
+            self.__bytes -= size
+            self.evictions += 1
+
+
+class SqliteFigureStore:
+    # Entries in a SQLite file, single-flight locks on the bytes of another, both shared by every process that
+    # opens the same directory. The OS releases a record lock when its holder exits, however it exits
+    errors = (sqlite3.Error, OSError)
+    lock_slots = 2 ** 20
+
+    def __init__(self, directory: Path, max_entries: int = 256, max_bytes: int = 64 * 2 ** 20) -> None:
+        self.directory = Path(directory)
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+
+        # Record locks belong to the process, threads of one process need their own on top. Closing any descriptor
+        # of the lock file would drop every lock the process holds on it, so the one opened here stays open, and a
+        # forked worker locks through the descriptor it inherits
+        self.__thread_locks = [threading.Lock() for _ in range(64)]
+        self.__local = threading.local()
+
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.__lock_file = open(self.directory / 'figures.lock', 'a+b')
+        # The small columns go first, reading past a blob in a row means reading through its overflow pages
+        self.__connection().execute(
+            'CREATE TABLE IF NOT EXISTS figures (key TEXT PRIMARY KEY, size INTEGER, used REAL, value BLOB)'
+        )
+
+    def __connection(self) -> sqlite3.Connection:
+        # One per thread and process, a SQLite connection must not be used across a fork
+        if getattr(self.__local, 'pid', None) != os.getpid():
+            connection = sqlite3.connect(self.directory / 'figures.sqlite', timeout=30, isolation_level=None)
+            connection.execute('PRAGMA journal_mode = WAL')
+            connection.execute('PRAGMA synchronous = NORMAL')
+            self.__local.connection, self.__local.pid = connection, os.getpid()
+        return self.__local.connection
+
+    @property
+    def stats(self) -> dict:
+        entries, size = self.__connection().execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM figures').fetchone()
+        return {'entries': entries, 'bytes': size}
+
+    def get(self, key: str) -> Optional[bytes]:
+        connection = self.__connection()
+        row = connection.execute('SELECT value FROM figures WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            return None
+
+        connection.execute('UPDATE figures SET used = ? WHERE key = ?', (time.time(), key))
+        return row[0]
+
+    def put(self, key: str, value: bytes) -> int:
+        # Returns how many entries were evicted to make room, least recently used first
+        if len(value) > self.max_bytes:
+            return 0
+
+        connection = self.__connection()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            connection.execute(
+                'INSERT OR REPLACE INTO figures VALUES (?, ?, ?, ?)', (key, len(value), time.time(), value),
+            )
+            entries, size = connection.execute('SELECT COUNT(*), SUM(size) FROM figures').fetchone()
+
+            evicted = []
+            if entries > self.max_entries or size > self.max_bytes:
+                for evicted_key, evicted_size in connection.execute('SELECT key, size FROM figures ORDER BY used'):
+                    if entries <= self.max_entries and size <= self.max_bytes:
+                        break
+                    evicted.append((evicted_key,))
+                    entries, size = entries - 1, size - evicted_size
+                connection.executemany('DELETE FROM figures WHERE key = ?', evicted)
+            connection.execute('COMMIT')
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+
+        return len(evicted)
+
+    @contextmanager
+    def lock(self, key: str) -> Iterator[None]:
+        slot = int(key[:8], 16) % self.lock_slots
+        with self.__thread_locks[slot % len(self.__thread_locks)]:
+            fcntl.lockf(self.__lock_file, fcntl.LOCK_EX, 1, slot)
+            try:
+                yield
+            finally:
+                fcntl.lockf(self.__lock_file, fcntl.LOCK_UN, 1, slot)
+
+    def clear(self) -> None:
+        self.__connection().execute('DELETE FROM figures')
+
+
+class RedisFigureStore:
+    # Entries expire after `ttl` seconds, beyond that Redis evicts by its own maxmemory policy. A lock outlives a
+    # holder that died for at most `lock_timeout` seconds
+    errors = (redis.RedisError,) if redis is not None else ()
+
+    def __init__(self, url: str, ttl: int = 3600, lock_timeout: float = 60, prefix: str = 'figure') -> None:
+        if redis is None:
+            raise ImportError("The redis cache backend needs the redis package")
+
+        self.ttl = ttl
+        self.lock_timeout = lock_timeout
+        self.prefix = prefix
+        self.__client = redis.Redis.from_url(url)
+
+    @property
+    def stats(self) -> dict:
+        return {'entries': sum(1 for _ in self.__client.scan_iter(f'{self.prefix}:*'))}
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self.__client.get(f'{self.prefix}:{key}')
+
+    def put(self, key: str, value: bytes) -> int:
+        self.__client.set(f'{self.prefix}:{key}', value, ex=self.ttl)
+        return 0
+
+    @contextmanager
+    def lock(self, key: str) -> Iterator[None]:
+        with self.__client.lock(f'{self.prefix}-lock:{key}', timeout=self.lock_timeout, sleep=0.01):
+            yield
+
+    def clear(self) -> None:
+        for key in self.__client.scan_iter(f'{self.prefix}:*'):
+            self.__client.delete(key)
+
+
+class SharedFigureCache:
+    # Same interface as FigureCache, over a store every worker on the host reads and writes. Values are pickled,
+    # the store is as trusted as the workers themselves
+    def __init__(self, store: Union[SqliteFigureStore, RedisFigureStore]) -> None:
+        self.store = store
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.errors = 0
+
+    @property
+    def stats(self) -> dict:
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'errors': self.errors,
+            **self.store.stats,
+        }
+
+    def __error(self, error: Exception) -> None:
+        # A broken store or entry costs the cache, not the response
+        self.errors += 1
+        figure_cache_lookups.labels('error').inc()
+        print(f"Figure cache failed: {error!r}")
+
+    @contextmanager
+    def __single_flight(self, store_key: str) -> Iterator[None]:
+        # The first worker to miss renders, the others wait for the lock and read its result. Failing to acquire the
+        # lock raises, failing to release it, as when it expired during a long render, only gets counted
+        lock = self.store.lock(store_key)
+        lock.__enter__()
+        try:
+            yield
+        finally:
+            try:
+                lock.__exit__(None, None, None)
+            except self.store.errors as e:
+                self.__error(e)
+
+    def get_or_compute(self, version: Hashable, key: Hashable, compute: Callable[[], Any]) -> Any:
+        # The version must mean the same data in every worker, unlike DatasetVersion.version which each one counts
+        store_key = hashlib.sha256(repr((version, key)).encode()).hexdigest()
+
+        with ExitStack() as stack:
+            try:
+                if (value := self.store.get(store_key)) is None:
+                    stack.enter_context(self.__single_flight(store_key))
+                    value = self.store.get(store_key)
+            except self.store.errors as e:
+                self.__error(e)
+                return compute()
+
+            if value is not None:
+                try:
+                    value = pickle.loads(value)
+                except Exception as e:
+                    # A corrupt entry is a miss, the render below overwrites it
+                    self.__error(e)
+                else:
+                    self.hits += 1
+                    figure_cache_lookups.labels('hit').inc()
+                    return value
+
+            self.misses += 1
+            figure_cache_lookups.labels('miss').inc()
+            value = compute()
+            try:
+                self.evictions += self.store.put(store_key, pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+            except self.store.errors as e:
+                self.__error(e)
+            return value
+
+    def clear(self) -> None:
+        self.store.clear()
+
+
+def create_figure_cache(
+        backend: str = 'auto', directory: Optional[str] = None, redis_url: Optional[str] = None,
+        max_entries: int = 256, max_bytes: int = 64 * 2 ** 20, ttl: int = 3600,
+) -> Union[FigureCache, SharedFigureCache]:
+    # "auto" shares the cache through FIGURE_CACHE_DIR when gunicorn.conf.py sets it, and keeps it per process
+    # otherwise. Entries are keyed by dataset content, not by the code that rendered them, so a shared directory
+    # must not outlive a deploy
+    directory = directory or os.environ.get('FIGURE_CACHE_DIR')
+    if backend == 'auto':
+        backend = 'sqlite' if directory else 'memory'
+
+    if backend == 'memory':
+        return FigureCache(max_entries, max_bytes)
+    if backend == 'sqlite':
+        directory = config_file.parent / (directory or '.figure_cache')
+        return SharedFigureCache(SqliteFigureStore(directory, max_entries, max_bytes))
+    if backend == 'redis':
+        return SharedFigureCache(RedisFigureStore(redis_url or 'redis://localhost:6379/0', ttl))
+
+    raise ValueError(f"Unknown figure cache backend: {backend}")
@@ -0,0 +1,67 @@
+import re
+import uuid
+from typing import Any
+
+import flask
+import numpy as np
+from plotly.io.json import config as plotly_json_config
+from plotly.io.json import to_json_plotly
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+__all__ = ['dumps', 'embed', 'install_serializer']
+
+# Plotly also escapes every '/', five extra bytes for each slash in a base64 typed array. '<', '>' and the
+# line separators are enough to keep the JSON safe inside HTML and JavaScript
+__escapes = ((b'<', b'\\u003c'), (b'>', b'\\u003e'))
+__line_separator_escapes = (('\u2028'.encode(), b'\\u2028'), ('\u2029'.encode(), b'\\u2029'))
+__placeholder = re.compile(rb'\{"__serialized__":"([0-9a-f]{32})"\}')
+
+
+def __default(value: Any) -> Any:
+    # What orjson does not encode natively: pandas objects, numpy scalars and non-contiguous arrays, timestamps
+    if hasattr(value, 'to_numpy'):
+        return value.to_numpy().tolist()
+    if isinstance(value, (np.ndarray, np.generic)):
+        return value.tolist()
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+
+def dumps(value: Any) -> bytes:
+    if orjson is None or plotly_json_config.default_engine == 'json':
+        return to_json_plotly(value, engine='json').encode()
+
+    serialized = orjson.dumps(value, default=__default, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+    # Searching for the multi-byte separators is slow, and they cannot occur in ASCII output anyway
+    for unsafe, escaped in __escapes if serialized.isascii() else __escapes + __line_separator_escapes:
+        if unsafe in serialized:
+            serialized = serialized.replace(unsafe, escaped)
+    return serialized
+
+
+def embed(serialized: bytes) -> dict:
+    # Stands in for an already serialized value in a callback's return, the response hook splices the bytes in
+    token = uuid.uuid4().hex
+    flask.g.setdefault('serialized_values', {})[token] = serialized
+    return {'__serialized__': token}
+
+
+def install_serializer(app, engine: str = 'auto') -> None:
+    # Dash encodes callback responses with plotly's JSON engine, "auto" picks orjson when it is installed
+    plotly_json_config.default_engine = engine
+
+    @app.server.after_request
+    def splice_serialized(response: flask.Response) -> flask.Response:
+        serialized_values = flask.g.pop('serialized_values', None)
+        if not serialized_values or response.status_code != 200:
+            return response
+
+        response.set_data(__placeholder.sub(
+            lambda match: serialized_values[match.group(1).decode()], response.get_data(),
+        ))
+        return response
@@ -1,6 +1,12 @@
+from .data_compose import compose_graph_columns
 from .data_compose import compose_housing_graph
 from .data_compose import compose_lm_graph
 from .data_compose import compose_travel_graph
+from .data_downsample import downsample_rows
+from .data_downsample import zoom_window
+from .data_encode import linear_trace_type
+from .data_encode import typed_array_length
+from .data_general import general_graph_columns
 from .data_general import general_housing_graph
 from .data_general import general_lm_graph
 from .data_general import general_travel_graph
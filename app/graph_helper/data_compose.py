@@ -1,201 +1,128 @@
 import datetime
+from typing import Optional
 from typing import Tuple
 
 import pandas as pd
 
-__linear_graph_types = ('line', 'bar')
-
-
-def __housing_linear(dataframe: pd.DataFrame, graph_type: str, is_value: bool = True) -> dict:
-    return {
-        'data': [
-            {
-                'x': dataframe['year'].unique(),
-                'y': dataframe[
-                    'value_ldn' if is_value else 'annual_growth_ldn'
-                ][dataframe['month'] == month],
-                'type': graph_type,
-                'name': f'{datetime.date(1990, month, 1).strftime("%B")}'
-            } for month in dataframe['month'].unique()
-        ],
-        'layout': {
-            'title': 'London House Price' if is_value else 'London House Price Trends',
-            'xaxis': {'title': 'Year', 'dtick': max(dataframe['year'].nunique() // 8, 1)},
-            'yaxis': {'title': 'Price' if is_value else 'Annual Growth'},
-        },
-    }
+from .data_encode import linear_trace_type
+from .data_encode import typed_array
+from .data_encode import year_axis
+from .data_pivot import pivot_year_grid
 
-
-def __travel_linear(dataframe: pd.DataFrame, graph_type: str, is_value: bool = True) -> dict:
-    return {
-        'data': [
-            {
-                'x': dataframe['year'].unique(),
-                'y': dataframe[
-                    'total_journeys' if is_value else 'annual_growth_total'
-                ][dataframe['period'] == period],
-                'type': graph_type,
-                'name': f'Period {period}'
-            } for period in dataframe['period'].unique()
-        ],
-        'layout': {
-            'title': 'London Travel Journey' if is_value else 'London Travel Journey Trends',
-            'xaxis': {'title': 'Year', 'dtick': max(dataframe['year'].nunique() // 8, 1)},
-            'yaxis': {'title': 'Journeys' if is_value else 'Annual Growth'},
-        },
-    }
+__linear_graph_types = ('line', 'bar')
 
 
-def __lm_linear(dataframe: pd.DataFrame, graph_type: str, is_value: bool = True) -> dict:
-    return {
-        'data': [
-            {
-                'x': dataframe['year'].unique(),
-                'y': dataframe[
-                    'unemployment_rate_ldn' if is_value else 'annual_growth_ldn'
-                ][dataframe['month'] == month],
-                'type': graph_type,
-                'name': f'{datetime.date(1990, month, 1).strftime("%B")}'
-            } for month in dataframe['month'].unique()
-        ],
-        'layout': {
-            'title': 'London Unemployment Rate' if is_value else 'London Unemployment Rate Trends',
-            'xaxis': {'title': 'Year', 'dtick': max(dataframe['year'].nunique() // 8, 1)},
-            'yaxis': {'title': 'Unemployment Rate' if is_value else 'Annual Growth'},
-        },
-    }
+def __month_label(month: int) -> str:
+    return datetime.date(1990, month, 1).strftime("%B")
 
 
-def __housing_heatmap(dataframe: pd.DataFrame, is_value: bool = True) -> dict:
-    x_label = dataframe['year'].unique()
-    y_label = dataframe['month'].unique()
+def __period_label(period: int) -> str:
+    return f'Period {period}'
 
-    data_mat = []
-    for month in y_label:
-        row = []
-        for year in x_label:
-            value = dataframe[
-                'value_ldn' if is_value else 'annual_growth_ldn'
-            ][(dataframe['year'] == year) & (dataframe['month'] == month)]
-            row.append(value.values[0] if not value.empty else None)
-        data_mat.append(row)
 
-    fig = {
-        'data': [{
-            'z': data_mat,
-            'x': x_label,
-            'y': [datetime.date(1990, month, 1).strftime("%B") for month in y_label],
-            'type': 'heatmap',
-            'colorscale': 'Viridis' if is_value else 'RdBu',
-        }],
-        'layout': {
-            'title': 'London House Price' if is_value else 'London House Price Trends',
-            'xaxis': {'title': 'Year'},
-        },
-    }
+__housing_spec = {
+    'key': 'month',
+    'key_label': __month_label,
+    'columns': ('value_ldn', 'annual_growth_ldn'),
+    'titles': ('London House Price', 'London House Price Trends'),
+    'yaxis_titles': ('Price', 'Annual Growth'),
+}
 
-    return fig
+__travel_spec = {
+    'key': 'period',
+    'key_label': __period_label,
+    'columns': ('total_journeys', 'annual_growth_total'),
+    'titles': ('London Travel Journey', 'London Travel Journey Trends'),
+    'yaxis_titles': ('Journeys', 'Annual Growth'),
+}
 
+__lm_spec = {
+    'key': 'month',
+    'key_label': __month_label,
+    'columns': ('unemployment_rate_ldn', 'annual_growth_ldn'),
+    'titles': ('London Unemployment Rate', 'London Unemployment Rate Trends'),
+    'yaxis_titles': ('Unemployment Rate', 'Annual Growth'),
+}
 
-def __travel_heatmap(dataframe: pd.DataFrame, is_value: bool = True) -> dict:
-    x_label = dataframe['year'].unique()
-    y_label = dataframe['period'].unique()
 
-    data_mat = []
-    for period in y_label:
-        row = []
-        for year in x_label:
-            value = dataframe[
-                'total_journeys' if is_value else 'annual_growth_total'
-            ][(dataframe['year'] == year) & (dataframe['period'] == period)]
-            row.append(value.values[0] if not value.empty else None)
-        data_mat.append(row)
+def __linear(
+        dataframe: pd.DataFrame, spec: dict, graph_type: str, webgl_threshold: Optional[int], is_value: bool = True,
+) -> dict:
+    years, keys, grid = pivot_year_grid(dataframe, spec['key'], spec['columns'][0 if is_value else 1])
+    x = year_axis(years)
+    trace_type = linear_trace_type(graph_type, grid.size, webgl_threshold)
 
-    fig = {
-        'data': [{
-            'z': data_mat,
-            'x': x_label,
-            'y': [f'Period {period}' for period in y_label],
-            'type': 'heatmap',
-            'colorscale': 'Viridis' if is_value else 'RdBu',
-        }],
+    return {
+        'data': [
+            {
+                **x,
+                'y': typed_array(row),
+                'type': trace_type,
+                'name': spec['key_label'](key),
+            } for key, row in zip(keys, grid)
+        ],
         'layout': {
-            'title': 'London Travel Journey' if is_value else 'London Travel Journey Trends',
-            'xaxis': {'title': 'Year'},
+            'title': spec['titles'][0 if is_value else 1],
+            'xaxis': {'title': 'Year', 'dtick': max(len(years) // 8, 1)},
+            'yaxis': {'title': spec['yaxis_titles'][0 if is_value else 1]},
         },
     }
 
-    return fig
-
 
-def _lm_heatmap(dataframe: pd.DataFrame, is_value: bool = True) -> dict:
-    x_label = dataframe['year'].unique()
-    y_label = dataframe['month'].unique()
+def __heatmap(dataframe: pd.DataFrame, spec: dict, is_value: bool = True) -> dict:
+    years, keys, grid = pivot_year_grid(dataframe, spec['key'], spec['columns'][0 if is_value else 1])
 
-    data_mat = []
-    for month in y_label:
-        row = []
-        for year in x_label:
-            value = dataframe[
-                'unemployment_rate_ldn' if is_value else 'annual_growth_ldn'
-            ][(dataframe['year'] == year) & (dataframe['month'] == month)]
-            row.append(value.values[0] if not value.empty else None)
-        data_mat.append(row)
-
-    fig = {
+    return {
         'data': [{
-            'z': data_mat,
-            'x': x_label,
-            'y': [datetime.date(1990, month, 1).strftime("%B") for month in y_label],
+            'z': typed_array(grid),
+            **year_axis(years),
+            'y': [spec['key_label'](key) for key in keys],
             'type': 'heatmap',
             'colorscale': 'Viridis' if is_value else 'RdBu',
         }],
         'layout': {
-            'title': 'London Unemployment Rate' if is_value else 'London Unemployment Rate Trends',
+            'title': spec['titles'][0 if is_value else 1],
             'xaxis': {'title': 'Year'},
         },
     }
 
-    return fig
 
-
-def compose_housing_graph(
-        dataframe: pd.DataFrame, value_graph_type: str, trends_graph_type: str,
+def __compose_graph(
+        dataframe: pd.DataFrame, spec: dict, value_graph_type: str, trends_graph_type: str,
+        webgl_threshold: Optional[int],
 ) -> Tuple[dict, dict]:
     return (
-        __housing_linear(dataframe, value_graph_type, is_value=True)
+        __linear(dataframe, spec, value_graph_type, webgl_threshold, is_value=True)
         if value_graph_type in __linear_graph_types
-        else __housing_heatmap(dataframe, is_value=True)
+        else __heatmap(dataframe, spec, is_value=True)
     ), (
-        __housing_linear(dataframe, trends_graph_type, is_value=False)
+        __linear(dataframe, spec, trends_graph_type, webgl_threshold, is_value=False)
         if trends_graph_type in __linear_graph_types
-        else __housing_heatmap(dataframe, is_value=False)
+        else __heatmap(dataframe, spec, is_value=False)
     )
 
 
+def compose_housing_graph(
+        dataframe: pd.DataFrame, value_graph_type: str, trends_graph_type: str, webgl_threshold: Optional[int] = None,
+) -> Tuple[dict, dict]:
+    return __compose_graph(dataframe, __housing_spec, value_graph_type, trends_graph_type, webgl_threshold)
+
+
 def compose_travel_graph(
-        dataframe: pd.DataFrame, value_graph_type: str, trends_graph_type: str,
+        dataframe: pd.DataFrame, value_graph_type: str, trends_graph_type: str, webgl_threshold: Optional[int] = None,
 ) -> Tuple[dict, dict]:
-    return (
-        __travel_linear(dataframe, value_graph_type, is_value=True)
-        if value_graph_type in __linear_graph_types
-        else __travel_heatmap(dataframe, is_value=True)
-    ), (
-        __travel_linear(dataframe, trends_graph_type, is_value=False)
-        if trends_graph_type in __linear_graph_types
-        else __travel_heatmap(dataframe, is_value=False)
-    )
+    return __compose_graph(dataframe, __travel_spec, value_graph_type, trends_graph_type, webgl_threshold)
 
 
 def compose_lm_graph(
-        dataframe: pd.DataFrame, value_graph_type: str, trends_graph_type: str,
+        dataframe: pd.DataFrame, value_graph_type: str, trends_graph_type: str, webgl_threshold: Optional[int] = None,
 ) -> Tuple[dict, dict]:
-    return (
-        __lm_linear(dataframe, value_graph_type, is_value=True)
-        if value_graph_type in __linear_graph_types
-        else _lm_heatmap(dataframe, is_value=True)
-    ), (
-        __lm_linear(dataframe, trends_graph_type, is_value=False)
-        if trends_graph_type in __linear_graph_types
-        else _lm_heatmap(dataframe, is_value=False)
-    )
+    return __compose_graph(dataframe, __lm_spec, value_graph_type, trends_graph_type, webgl_threshold)
+
+
+# Columns each graph reads, so callers can materialize the derived ones before building it
+compose_graph_columns = {
+    compose_housing_graph: __housing_spec['columns'],
+    compose_travel_graph: __travel_spec['columns'],
+    compose_lm_graph: __lm_spec['columns'],
+}
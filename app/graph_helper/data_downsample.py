@@ -0,0 +1,105 @@
+from typing import Optional
+from typing import Sequence
+from typing import Tuple
+
+import numpy as np
+import pandas as pd
+
+__key_columns = ('year', 'month', 'period')
+
+
+def lttb_indices(y: np.ndarray, n_out: int) -> np.ndarray:
+    # Largest-Triangle-Three-Buckets over evenly spaced points, returns the kept positions
+    n = len(y)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    y = np.where(np.isnan(y), np.nanmean(y) if np.isfinite(y).any() else 0.0, y)
+    x = np.arange(n, dtype=np.float64)
+
+    # First and last points are always kept, the rest are split into n_out - 2 buckets
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    bucket_x = np.add.reduceat(x[1:n - 1], edges[:-1] - 1) / np.diff(edges)
+    bucket_y = np.add.reduceat(y[1:n - 1], edges[:-1] - 1) / np.diff(edges)
+    next_x, next_y = np.append(bucket_x[1:], x[-1]), np.append(bucket_y[1:], y[-1])
+
+    kept = np.empty(n_out, dtype=np.int64)
+    kept[0], kept[-1] = 0, n - 1
+
+    previous = 0
+    for bucket, (start, stop) in enumerate(zip(edges[:-1], edges[1:])):
+        # Twice the triangle area between the previous pick, each candidate and the next bucket's mean
+        area = np.abs(
+            (x[previous] - next_x[bucket]) * (y[start:stop] - y[previous])
+            - (x[previous] - x[start:stop]) * (next_y[bucket] - y[previous])
+        )
+        previous = start + int(np.argmax(area))
+        kept[bucket + 1] = previous
+
+    return kept
+
+
+def minmax_indices(y: np.ndarray, n_out: int) -> np.ndarray:
+    # Minimum and maximum of each bucket, fully vectorized
+    n = len(y)
+    if n_out >= n or n_out < 4:
+        return np.arange(n)
+
+    n_buckets = n_out // 2
+    edges = np.linspace(0, n, n_buckets + 1).astype(np.int64)
+    filled_low = np.where(np.isnan(y), np.inf, y)
+    filled_high = np.where(np.isnan(y), -np.inf, y)
+
+    bucket_of = np.repeat(np.arange(n_buckets), np.diff(edges))
+    low, high = np.minimum.reduceat(filled_low, edges[:-1]), np.maximum.reduceat(filled_high, edges[:-1])
+
+    # First position in each bucket that holds its min / max
+    is_low = filled_low == low[bucket_of]
+    is_high = filled_high == high[bucket_of]
+    first_low = np.maximum.reduceat(np.where(is_low, -np.arange(n), -n), edges[:-1])
+    first_high = np.maximum.reduceat(np.where(is_high, -np.arange(n), -n), edges[:-1])
+
+    return np.unique(np.concatenate([-first_low, -first_high]))
+
+
+def downsample_rows(
+        dataframe: pd.DataFrame, max_points: int, method: str = 'lttb', value_columns: Optional[Sequence[str]] = None,
+) -> pd.DataFrame:
+    # Keep the union of the rows each value column selects, so all traces share one set of x positions
+    if value_columns is None:
+        value_columns = [column for column in dataframe.columns if column not in __key_columns]
+    if len(dataframe) <= max_points or not value_columns:
+        return dataframe
+
+    select = minmax_indices if method == 'minmax' else lttb_indices
+    budget = max(max_points // len(value_columns), 4)
+
+    rows = np.unique(np.concatenate([
+        select(dataframe[column].to_numpy(dtype=np.float64), budget) for column in value_columns
+    ]))
+    return dataframe.iloc[rows]
+
+
+def zoom_window(dataframe: pd.DataFrame, relayout_data: Optional[dict]) -> Optional[Tuple[int, int]]:
+    # Row offsets [start, stop) covered by a zoomed date x axis, None when the graph is not zoomed in
+    if not relayout_data or 'xaxis.range[0]' not in relayout_data or 'xaxis.range[1]' not in relayout_data:
+        return None
+
+    try:
+        bounds = np.array(
+            [relayout_data['xaxis.range[0]'], relayout_data['xaxis.range[1]']], dtype='datetime64[ms]',
+        ).astype(np.float64)
+    except ValueError:
+        return None
+
+    # Same placement as the date axis, each step sits mid-way through its month or period
+    steps_per_year = 13 if 'period' in dataframe else 12
+    step_column = 'period' if 'period' in dataframe else 'month'
+    dx = 365.2425 * 86400000 / steps_per_year
+    ordinal = dataframe['year'].to_numpy(np.int64) * steps_per_year + dataframe[step_column].to_numpy(np.int64) - 1
+    low, high = np.sort(bounds / dx + 1970 * steps_per_year - 0.5)
+
+    # One extra point on each side so lines run to the edge of the view
+    start = max(int(np.searchsorted(ordinal, low, side='left')) - 1, 0)
+    stop = min(int(np.searchsorted(ordinal, high, side='right')) + 1, len(dataframe))
+    return start, stop
@@ -0,0 +1,96 @@
+import base64
+from typing import Optional
+from typing import Union
+
+import numpy as np
+import pandas as pd
+
+# Element types plotly.js accepts in a typed array spec
+__plotly_dtypes = {
+    'int8': 'i1', 'uint8': 'u1', 'int16': 'i2', 'uint16': 'u2', 'int32': 'i4', 'uint32': 'u4',
+    'float32': 'f4', 'float64': 'f8',
+}
+__float32_rtol = 1e-6
+
+
+def __narrow(array: np.ndarray, compact_float: bool) -> np.ndarray:
+    if array.dtype.kind == 'f' and compact_float:
+        narrowed = array.astype(np.float32)
+        with np.errstate(over='ignore', invalid='ignore'):
+            if np.allclose(narrowed, array, rtol=__float32_rtol, atol=0, equal_nan=True):
+                return narrowed
+        return array.astype(np.float64)
+
+    if array.dtype.kind in 'iub':
+        for dtype in (np.int8, np.int16, np.int32):
+            info = np.iinfo(dtype)
+            if array.size == 0 or (array.min() >= info.min and array.max() <= info.max):
+                return array.astype(dtype)
+
+    # 64-bit integers have no typed array in plotly.js
+    return array.astype(np.float64)
+
+
+def typed_array(values: Union[np.ndarray, pd.Series], compact_float: bool = True) -> dict:
+    # Base64 typed array spec for plotly.js, narrowed to the smallest type that keeps the values
+    array = __narrow(np.asarray(values), compact_float)
+    array = np.ascontiguousarray(array, dtype=array.dtype.newbyteorder('<'))
+
+    spec = {
+        'dtype': __plotly_dtypes[array.dtype.name],
+        'bdata': base64.b64encode(array.data).decode('ascii'),
+    }
+    if array.ndim > 1:
+        spec['shape'] = ', '.join(str(dim) for dim in array.shape)
+
+    return spec
+
+
+def typed_array_length(spec: Union[dict, list]) -> int:
+    # Element count of a typed array spec, or a plain list, without decoding it
+    if not isinstance(spec, dict):
+        return len(spec)
+
+    padding = spec['bdata'][-2:].count('=')
+    return (len(spec['bdata']) // 4 * 3 - padding) // int(spec['dtype'][1])
+
+
+def linear_trace_type(graph_type: str, points: int, webgl_threshold: Optional[int] = None) -> str:
+    # SVG lines are redrawn point by point on every pan, zoom and hover, past the threshold of points in the figure
+    # they are drawn with WebGL instead. scattergl defaults to the same mode, colors, hover and legend as the SVG
+    # trace. Bars have no WebGL counterpart
+    if graph_type == 'line' and webgl_threshold is not None and points > webgl_threshold:
+        return 'scattergl'
+    return graph_type
+
+
+def __date_axis(year: np.ndarray, step: np.ndarray, steps_per_year: int) -> dict:
+    ordinal = year * steps_per_year + step - 1
+    # Step length averaged over the Gregorian cycle, in milliseconds
+    dx = 365.2425 * 86400000 / steps_per_year
+
+    if len(ordinal) and np.all(np.diff(ordinal) == 1):
+        # Evenly spaced rows need no x array at all, each point sits mid-step so a
+        # date hover format never drifts into the neighbouring month or year
+        x0 = (ordinal[0] - 1970 * steps_per_year + 0.5) * dx
+        return {'x0': x0, 'dx': dx}
+
+    return {'x': typed_array((ordinal - 1970 * steps_per_year + 0.5) * dx, compact_float=False)}
+
+
+def month_axis(dataframe: pd.DataFrame) -> dict:
+    # x attributes placing monthly rows on a date-typed axis
+    return __date_axis(dataframe['year'].to_numpy(np.int64), dataframe['month'].to_numpy(np.int64), 12)
+
+
+def period_axis(dataframe: pd.DataFrame) -> dict:
+    # x attributes placing the thirteen four-week periods of each year on a date-typed axis
+    return __date_axis(dataframe['year'].to_numpy(np.int64), dataframe['period'].to_numpy(np.int64), 13)
+
+
+def year_axis(years: np.ndarray) -> dict:
+    # x attributes for a numeric year axis, just the first year and step when the years are consecutive
+    if len(years) and np.all(np.diff(years) == 1):
+        return {'x0': int(years[0]), 'dx': 1}
+
+    return {'x': typed_array(years)}
@@ -1,53 +1,86 @@
+from typing import Optional
 from typing import Tuple
 
 import pandas as pd
 
-
-def general_housing_graph(
-        dataframe: pd.DataFrame, value_graph_type: str, trends_graph_type: str
+from .data_encode import linear_trace_type
+from .data_encode import month_axis
+from .data_encode import period_axis
+from .data_encode import typed_array
+
+__housing_spec = {
+    'dates': month_axis,
+    'series': (('value_ldn', 'annual_growth_ldn', 'London'), ('value_uk', 'annual_growth_uk', 'UK')),
+    'titles': ('House Price', 'House Price Trends'),
+    'xaxis_title': 'Year-Month',
+    'yaxis_title': 'Price',
+}
+
+__travel_spec = {
+    'dates': period_axis,
+    'series': (('bus_journeys', 'annual_growth_bus', 'Bus'), ('tube_journeys', 'annual_growth_tube', 'Tube')),
+    'titles': ('Travel Journeys', 'Travel Journeys Trends'),
+    'xaxis_title': 'Year #Period',
+    'yaxis_title': 'Journeys',
+}
+
+__lm_spec = {
+    'dates': month_axis,
+    'series': (
+        ('unemployment_rate_ldn', 'annual_growth_ldn', 'London'),
+        ('unemployment_rate_uk', 'annual_growth_uk', 'UK'),
+    ),
+    'titles': ('Unemployment Rate', 'Unemployment Rate Trends'),
+    'xaxis_title': 'Year-Month',
+    'yaxis_title': 'Unemployment Rate',
+}
+
+
+def __general_graph(
+        dataframe: pd.DataFrame, spec: dict, value_graph_type: str, trends_graph_type: str,
+        webgl_threshold: Optional[int],
 ) -> Tuple[dict, dict]:
-    x_label = dataframe['year'].astype(str) + '-' + dataframe['month'].astype(str)
+    # A date-typed axis from the first date and step, instead of a label string per row and trace
+    x = spec['dates'](dataframe)
+    points = len(dataframe) * len(spec['series'])
+
+    # Periods are not calendar months, hover shows the period number rather than a date
+    hover = {
+        'customdata': typed_array(dataframe['period']),
+        'hovertemplate': '(%{x|%Y} #%{customdata}, %{y})',
+    } if spec['dates'] is period_axis else {}
+    xaxis = {'title': spec['xaxis_title'], 'type': 'date', **({} if hover else {'hoverformat': '%Y-%m'})}
 
     fig_value = {
         'data': [
             {
-                'x': x_label,
-                'y': dataframe['value_ldn'],
-                'type': value_graph_type,
-                'name': 'London',
-            },
-            {
-                'x': x_label,
-                'y': dataframe['value_uk'],
-                'type': value_graph_type,
-                'name': 'UK',
-            },
+                **x,
+                'y': typed_array(dataframe[value_column]),
+                'type': linear_trace_type(value_graph_type, points, webgl_threshold),
+                'name': name,
+                **hover,
+            } for value_column, _, name in spec['series']
         ],
         'layout': {
-            'title': 'House Price',
-            'xaxis': {'title': 'Year-Month'},
-            'yaxis': {'title': 'Price'},
+            'title': spec['titles'][0],
+            'xaxis': xaxis,
+            'yaxis': {'title': spec['yaxis_title']},
         },
     }
 
     fig_trends = {
         'data': [
             {
-                'x': x_label,
-                'y': dataframe['annual_growth_ldn'],
-                'type': trends_graph_type,
-                'name': 'London',
-            },
-            {
-                'x': x_label,
-                'y': dataframe['annual_growth_uk'],
-                'type': trends_graph_type,
-                'name': 'UK',
-            },
+                **x,
+                'y': typed_array(dataframe[trends_column]),
+                'type': linear_trace_type(trends_graph_type, points, webgl_threshold),
+                'name': name,
+                **hover,
+            } for _, trends_column, name in spec['series']
         ],
         'layout': {
-            'title': 'House Price Trends',
-            'xaxis': {'title': 'Year-Month'},
+            'title': spec['titles'][1],
+            'xaxis': xaxis,
             'yaxis': {'title': 'Annual Growth'},
         },
     }
@@ -55,105 +88,30 @@ def general_housing_graph(
     return fig_value, fig_trends
 
 
-def general_travel_graph(
-        dataframe: pd.DataFrame, value_graph_type: str, trends_graph_type: str
+def general_housing_graph(
+        dataframe: pd.DataFrame, value_graph_type: str, trends_graph_type: str, webgl_threshold: Optional[int] = None,
 ) -> Tuple[dict, dict]:
-    x_label = dataframe['year'].astype(str) + ' #' + dataframe['period'].astype(str)
+    return __general_graph(dataframe, __housing_spec, value_graph_type, trends_graph_type, webgl_threshold)
 
-    fig_value = {
-        'data': [
-            {
-                'x': x_label,
-                'y': dataframe['bus_journeys'],
-                'type': value_graph_type,
-                'name': 'Bus',
-            },
-            {
-                'x': x_label,
-                'y': dataframe['tube_journeys'],
-                'type': value_graph_type,
-                'name': 'Tube',
-            },
-        ],
-        'layout': {
-            'title': 'Travel Journeys',
-            'xaxis': {'title': 'Year #Period'},
-            'yaxis': {'title': 'Journeys'},
-        },
-    }
-
-    fig_trends = {
-        'data': [
-            {
-                'x': x_label,
-                'y': dataframe['annual_growth_bus'],
-                'type': trends_graph_type,
-                'name': 'Bus',
-            },
-            {
-                'x': x_label,
-                'y': dataframe['annual_growth_tube'],
-                'type': trends_graph_type,
-                'name': 'Tube',
-            },
-        ],
-        'layout': {
-            'title': 'Travel Journeys Trends',
-            'xaxis': {'title': 'Year #Period'},
-            'yaxis': {'title': 'Annual Growth'},
-        },
-    }
 
-    return fig_value, fig_trends
+def general_travel_graph(
+        dataframe: pd.DataFrame, value_graph_type: str, trends_graph_type: str, webgl_threshold: Optional[int] = None,
+) -> Tuple[dict, dict]:
+    return __general_graph(dataframe, __travel_spec, value_graph_type, trends_graph_type, webgl_threshold)
 
 
 def general_lm_graph(
-        dataframe: pd.DataFrame, value_graph_type: str, trends_graph_type: str,
+        dataframe: pd.DataFrame, value_graph_type: str, trends_graph_type: str, webgl_threshold: Optional[int] = None,
 ) -> Tuple[dict, dict]:
-    x_label = dataframe['year'].astype(str) + '-' + dataframe['month'].astype(str)
-
-    fig_value = {
-        'data': [
-            {
-                'x': x_label,
-                'y': dataframe['unemployment_rate_ldn'],
-                'type': value_graph_type,
-                'name': 'London',
-            },
-            {
-                'x': x_label,
-                'y': dataframe['unemployment_rate_uk'],
-                'type': value_graph_type,
-                'name': 'UK',
-            },
-        ],
-        'layout': {
-            'title': 'Unemployment Rate',
-            'xaxis': {'title': 'Year-Month'},
-            'yaxis': {'title': 'Unemployment Rate'},
-        },
-    }
-
-    fig_trends = {
-        'data': [
-            {
-                'x': x_label,
-                'y': dataframe['annual_growth_ldn'],
-                'type': trends_graph_type,
-                'name': 'London',
-            },
-            {
-                'x': x_label,
-                'y': dataframe['annual_growth_uk'],
-                'type': trends_graph_type,
-                'name': 'UK',
-            },
-        ],
-        'layout': {
-            'title': 'Unemployment Rate Trends',
-            'xaxis': {'title': 'Year-Month'},
-            'yaxis': {'title': 'Annual Growth'},
-        },
-    }
-
-    return fig_value, fig_trends
+    return __general_graph(dataframe, __lm_spec, value_graph_type, trends_graph_type, webgl_threshold)
+
+
+# Columns each graph reads, so callers can materialize the derived ones before building it
+general_graph_columns = {
+    graph_func: tuple(column for series in spec['series'] for column in series[:2])
+    for graph_func, spec in (
+        (general_housing_graph, __housing_spec),
+        (general_travel_graph, __travel_spec),
+        (general_lm_graph, __lm_spec),
+    )
+}
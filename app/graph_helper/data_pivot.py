@@ -0,0 +1,18 @@
+from typing import Tuple
+
+import numpy as np
+import pandas as pd
+
+
+def pivot_year_grid(
+        dataframe: pd.DataFrame, key_column: str, value_column: str,
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    # (key x year) matrix of `value_column`, NaN where a cell has no row
+    years, year_pos = np.unique(dataframe['year'].to_numpy(), return_inverse=True)
+    keys, key_pos = np.unique(dataframe[key_column].to_numpy(), return_inverse=True)
+
+    grid = np.full((len(keys), len(years)), np.nan)
+    # Scatter in reverse so the first row wins when a cell is duplicated
+    grid[key_pos[::-1], year_pos[::-1]] = dataframe[value_column].to_numpy()[::-1]
+
+    return years, keys, grid
@@ -1,19 +1,43 @@
 import dash
 import dash_bootstrap_components as dbc
 import dash_mantine_components as dmc
+import flask
 from dash import dcc
+from dash import ctx
 from dash import html
+from dash import no_update
+from dash import Patch
+from dash.dependencies import ClientsideFunction
 from dash.dependencies import Input
 from dash.dependencies import Output
+from dash.dependencies import State
+from dash.exceptions import PreventUpdate
 
-from app.data_provider import datasets
+from app.compression import asset_url
+from app.compression import install_compression
+from app.config import load_config
+from app.data_export import export_formats
+from app.data_export import iter_export
+from app.data_provider import data_provider
 from app.data_provider import datasets_label
+from app.data_schema import schemas
+from app.figure_cache import create_figure_cache
+from app.figure_json import dumps
+from app.figure_json import embed
+from app.figure_json import install_serializer
+from app.graph_helper import compose_graph_columns
 from app.graph_helper import compose_housing_graph
 from app.graph_helper import compose_lm_graph
 from app.graph_helper import compose_travel_graph
+from app.graph_helper import downsample_rows
+from app.graph_helper import general_graph_columns
 from app.graph_helper import general_housing_graph
 from app.graph_helper import general_lm_graph
 from app.graph_helper import general_travel_graph
+from app.graph_helper import linear_trace_type
+from app.graph_helper import typed_array_length
+from app.graph_helper import zoom_window
+from app.metrics import instrument
 
 app = dash.Dash(
     __name__,
@@ -25,6 +49,43 @@ app.title = "London Economic Today Dashboard"
 server = app.server
 app.config.suppress_callback_exceptions = True
 
+figure_cache = create_figure_cache(**load_config().get('cache', {}))
+downsample_config = load_config().get('downsample', {})
+webgl_config = load_config().get('webgl', {})
+webgl_threshold = webgl_config.get('threshold', 5000) if webgl_config.get('enabled', True) else None
+export_config = load_config().get('export', {})
+linear_graph_types = ('line', 'bar')
+
+graph_func_map = {
+    ('housing_data', 'general'): general_housing_graph,
+    ('housing_data', 'compose'): compose_housing_graph,
+    ('travel_data', 'general'): general_travel_graph,
+    ('travel_data', 'compose'): compose_travel_graph,
+    ('lm_data', 'general'): general_lm_graph,
+    ('lm_data', 'compose'): compose_lm_graph,
+}
+graph_columns = {**general_graph_columns, **compose_graph_columns}
+
+# Series compared in the summary panel, and the format of their values
+summary_series = {
+    'housing_data': ((('value_ldn', 'London'), ('value_uk', 'UK')), '£{:,.0f}'),
+    'travel_data': ((('bus_journeys', 'Bus'), ('tube_journeys', 'Tube')), '{:,.0f}'),
+    'lm_data': ((('unemployment_rate_ldn', 'London'), ('unemployment_rate_uk', 'UK')), '{:.2f}%'),
+}
+
+# Shown in place of both graphs until the datasets have loaded
+loading_figure = {
+    'layout': {
+        'xaxis': {'visible': False},
+        'yaxis': {'visible': False},
+        'annotations': [{'text': "Loading data...", 'showarrow': False, 'font': {'size': 16}}],
+    },
+}
+
+
+def year_ranges() -> dict:
+    return {dataset: index.years for dataset, index in data_provider.current.year_indexes.items()}
+
 
 def description_card() -> html.Div:
     intro_md = "Economic data of London, including " \
@@ -44,17 +105,24 @@ def control_card() -> html.Div:
     return html.Div(
         id="control-card",
         children=[
+            # Year range of every dataset, read by the clientside range controls.
+            # Empty while the datasets are loading, then filled in by polling
+            dcc.Store(id="store-year-ranges", data=year_ranges()),
+            dcc.Interval(id="poll-data-ready", interval=1000, disabled=data_provider.ready),
+            # Dataset and year range once normalized, the one input of everything that shows the selection
+            dcc.Store(id="store-selection"),
             html.P("Select Dataset"),
             dcc.Dropdown(
                 id="ctl-dataset-sel",
-                options={value: datasets_label[value] for value in datasets.keys()},
-                value=list(datasets.keys())[0],
+                options=datasets_label,
+                value=list(datasets_label.keys())[0],
+                clearable=False,
             ),
             html.Hr(),
             html.P("Select Display Range"),
             dbc.Row([
-                dbc.Col(dcc.Dropdown(id="ctl-year-sel-start"), width=6),
-                dbc.Col(dcc.Dropdown(id="ctl-year-sel-end"), width=6),
+                dbc.Col(dcc.Dropdown(id="ctl-year-sel-start", clearable=False), width=6),
+                dbc.Col(dcc.Dropdown(id="ctl-year-sel-end", clearable=False), width=6),
             ]),
             html.Br(),
             # Display the selected date range
@@ -92,139 +160,355 @@ def control_card() -> html.Div:
                 fullWidth=True,
                 data=[],
             ),
+            html.Hr(),
+            html.P("Download Selected Range"),
+            dbc.Row([
+                dbc.Col(dcc.Dropdown(
+                    id="ctl-export-format",
+                    options={export_format: label for export_format, (label, _) in export_formats.items()},
+                    value="csv",
+                    clearable=False,
+                ), width=6),
+                # A plain link, so the browser downloads the streamed file itself rather than through a callback
+                dbc.Col(html.A(
+                    dbc.Button("Download", color="secondary", className="w-100"),
+                    id="lnk-export-data",
+                    download="",
+                ), width=6),
+            ]),
         ],
     )
 
 
-app.layout = dbc.Container(
-    id="app-container",
-    children=[
-        # Banner
-        html.Div(
-            id="banner",
-            className="banner",
-            children=[html.Img(src=app.get_asset_url("app_logo.png"))],
-        ),
-        # Left column
-        html.Div(
-            id="left-column",
-            className="four columns",
-            children=[description_card(), control_card()],
-        ),
-        # Right column
-        html.Div(
-            id="right-column",
-            className="eight columns",
-            children=[
-                html.Div(
-                    id="data_value_card",
-                    children=[
-                        html.B("Value Data"),
-                        html.Hr(),
-                        dcc.Graph(id="disp-graph-data-value"),
-                    ],
-                ),
-                html.Div(
-                    id="data_trends_card",
-                    children=[
-                        html.B("Annual Growth"),
-                        html.Hr(),
-                        dcc.Graph(id="disp-graph-data-trends"),
-                    ],
-                ),
-            ],
-        ),
-    ],
-)
+def serve_layout() -> dbc.Container:
+    return dbc.Container(
+        id="app-container",
+        children=[
+            # Banner
+            html.Div(
+                id="banner",
+                className="banner",
+                children=[html.Img(src=asset_url(app, "app_logo.png"))],
+            ),
+            # Left column
+            html.Div(
+                id="left-column",
+                className="four columns",
+                children=[description_card(), control_card()],
+            ),
+            # Right column
+            html.Div(
+                id="right-column",
+                className="eight columns",
+                children=[
+                    html.Div(
+                        id="data_summary_card",
+                        children=[
+                            html.B("Summary"),
+                            html.Hr(),
+                            html.Div(id="disp-data-summary"),
+                        ],
+                    ),
+                    html.Div(
+                        id="data_value_card",
+                        children=[
+                            html.B("Value Data"),
+                            html.Hr(),
+                            dcc.Graph(id="disp-graph-data-value"),
+                            dcc.Store(id="store-graph-width"),
+                            dcc.Store(id="store-graph-zoom"),
+                            dcc.Store(id="store-rendered-figures"),
+                        ],
+                    ),
+                    html.Div(
+                        id="data_trends_card",
+                        children=[
+                            html.B("Annual Growth"),
+                            html.Hr(),
+                            dcc.Graph(id="disp-graph-data-trends"),
+                        ],
+                    ),
+                ],
+            ),
+        ],
+    )
 
 
-# CB: Dataset selection >> Date range options
-@app.callback(
-    Output("ctl-year-sel-start", "options"),
-    Output("ctl-year-sel-end", "options"),
-    Output("ctl-year-sel-start", "value"),
-    Output("ctl-year-sel-end", "value"),
-    Output("disp-year-sel", "min"),
-    Output("disp-year-sel", "max"),
-    Input("ctl-dataset-sel", "value"),
-    Input("ctl-year-sel-start", "value"),
-    Input("ctl-year-sel-end", "value"),
-)
-def update_date_range_options(selected_dataset, start_date, end_date):
-    dataset = datasets[selected_dataset]
+app.layout = serve_layout
 
-    date_range = sorted(dataset['year'].unique())
 
-    if start_date is None or start_date not in date_range:
-        start_date = date_range[0]
-    if end_date is None or end_date not in date_range:
-        end_date = date_range[-1]
+# CB: Data loading >> Year ranges
+@app.callback(
+    Output("store-year-ranges", "data"),
+    Output("poll-data-ready", "disabled"),
+    Input("poll-data-ready", "n_intervals"),
+    prevent_initial_call=True,
+)
+def update_year_ranges(_):
+    if not data_provider.ready:
+        raise PreventUpdate
 
-    date_range_options_start = [{'label': str(year), 'value': year} for year in date_range if year <= end_date]
-    date_range_options_end = [{'label': str(year), 'value': year} for year in date_range if year >= start_date]
+    return year_ranges(), True
 
-    return date_range_options_start, date_range_options_end, start_date, end_date, date_range[0], date_range[-1]
 
+# CB: Dataset selection >> Date range
+# Keeps what the dataset covers of the selected years. The only step that writes the year dropdowns, and it does not
+# listen to them, so a change goes down the graph once instead of looping back through its own outputs
+app.clientside_callback(
+    ClientsideFunction(namespace="ui", function_name="normalize_date_range"),
+    Output("ctl-year-sel-start", "value"),
+    Output("ctl-year-sel-end", "value"),
+    Input("ctl-dataset-sel", "value"),
+    Input("store-year-ranges", "data"),
+    State("ctl-year-sel-start", "value"),
+    State("ctl-year-sel-end", "value"),
+)
 
-# CB: Date range selection >> Date range display
-@app.callback(
+# CB: Date range selection >> Date range options, display and selection
+app.clientside_callback(
+    ClientsideFunction(namespace="ui", function_name="update_date_range"),
+    Output("ctl-year-sel-start", "options"),
+    Output("ctl-year-sel-end", "options"),
+    Output("disp-year-sel", "min"),
+    Output("disp-year-sel", "max"),
     Output("disp-year-sel", "marks"),
     Output("disp-year-sel", "value"),
+    Output("store-selection", "data"),
     Input("ctl-year-sel-start", "value"),
     Input("ctl-year-sel-end", "value"),
-    Input("disp-year-sel", "min"),
-    Input("disp-year-sel", "max"),
+    State("ctl-dataset-sel", "value"),
+    State("store-year-ranges", "data"),
 )
-def update_date_range_display(start_date, end_date, min_date, max_date):
-    args = [start_date, end_date, min_date, max_date]
-    return {str(date): str(date) for date in args}, [start_date, end_date]
-
 
 # CB: View selection >> Graph type options
-@app.callback(
+app.clientside_callback(
+    ClientsideFunction(namespace="ui", function_name="update_graph_types"),
     Output("ctl-value-graph-type", "data"),
     Output("ctl-trends-graph-type", "data"),
     Output("ctl-value-graph-type", "value"),
     Output("ctl-trends-graph-type", "value"),
     Input("ctl-view-mode-sel", "value"),
 )
-def update_graph_types(view_type):
-    graph_types = [
-        {"label": "Line", "value": "line"},
-        {"label": "Bar", "value": "bar"},
-        {"label": "Heatmap", "value": "heatmap", "disabled": view_type == 'general'},
-    ]
 
-    return graph_types, graph_types, *['line', 'bar' if view_type == 'general' else 'heatmap']
+
+# CB: Graph width >> Downsampling budget
+app.clientside_callback(
+    ClientsideFunction(namespace="ui", function_name="measure_graph_width"),
+    Output("store-graph-width", "data"),
+    Input("disp-graph-data-value", "id"),
+)
+
+
+# CB: Graph relayout >> Zoom
+# Plotly reports every relayout, autosizing and modebar toggles included, only x axis zooms go on to the server
+app.clientside_callback(
+    ClientsideFunction(namespace="ui", function_name="filter_graph_zoom"),
+    Output("store-graph-zoom", "data"),
+    Input("disp-graph-data-value", "relayoutData"),
+    Input("disp-graph-data-trends", "relayoutData"),
+    prevent_initial_call=True,
+)
 
 
 # CB: Data selection >> Graphs
 @app.callback(
     Output("disp-graph-data-value", "figure"),
     Output("disp-graph-data-trends", "figure"),
-    Input("ctl-dataset-sel", "value"),
+    Output("store-rendered-figures", "data"),
+    Input("store-selection", "data"),
     Input("ctl-view-mode-sel", "value"),
     Input("ctl-value-graph-type", "value"),
     Input("ctl-trends-graph-type", "value"),
-    Input("ctl-year-sel-start", "value"),
-    Input("ctl-year-sel-end", "value"),
+    Input("store-graph-zoom", "data"),
+    Input("store-graph-width", "data"),
+    State("store-rendered-figures", "data"),
 )
-def update_data_value(selected_dataset, view_type, value_graph_type, trends_graph_type, start_year, end_year):
-    selected_df = datasets[selected_dataset]
-    filtered_df = selected_df[(selected_df['year'] >= start_year) & (selected_df['year'] <= end_year)]
-
-    graph_func_map = {
-        ('housing_data', 'general'): general_housing_graph,
-        ('housing_data', 'compose'): compose_housing_graph,
-        ('travel_data', 'general'): general_travel_graph,
-        ('travel_data', 'compose'): compose_travel_graph,
-        ('lm_data', 'general'): general_lm_graph,
-        ('lm_data', 'compose'): compose_lm_graph,
+def update_data_value(selection, view_type, value_graph_type, trends_graph_type, zoom, graph_width, rendered):
+    current = data_provider.current
+    if not data_provider.ready or not selection:
+        return loading_figure, loading_figure, None
+
+    selected_dataset, start_year, end_year = selection['dataset'], selection['start'], selection['end']
+
+    graph_types = [value_graph_type, trends_graph_type]
+    data_key = [current.version, selected_dataset, view_type, start_year, end_year]
+    # Derived columns are computed the first time a graph reading them is shown for this dataset version
+    graph_func = graph_func_map.get((selected_dataset, view_type))
+    columns = graph_columns.get(graph_func, ())
+    filtered_df = current.year_range(selected_dataset, start_year, end_year, columns)
+
+    max_points, window = None, None
+    if view_type == 'general' and downsample_config.get('enabled', True):
+        max_points = (
+            max(int(round(graph_width * downsample_config.get('points_per_pixel', 2), -2)), 100)
+            if graph_width else downsample_config.get('max_points', 2000)
+        )
+
+    # Zooming only needs the server when the full range was downsampled, then the visible window is re-resolved
+    if ctx.triggered_id == "store-graph-zoom":
+        if max_points is None or len(filtered_df) <= max_points:
+            raise PreventUpdate
+
+        relayout = zoom
+        window = zoom_window(filtered_df, relayout)
+        if window is None and not relayout.get('xaxis.autorange'):
+            raise PreventUpdate
+
+    def render():
+        if graph_func is None:
+            return None
+
+        plot_df = filtered_df.iloc[window[0]:window[1]] if window else filtered_df
+        if max_points is not None:
+            plot_df = downsample_rows(plot_df, max_points, downsample_config.get('method', 'lttb'), columns)
+
+        figures = graph_func(plot_df, value_graph_type, trends_graph_type, webgl_threshold)
+
+        if window:
+            # Keep the view where the user zoomed, rather than autoranging to the window's edge points
+            x_range = [relayout['xaxis.range[0]'], relayout['xaxis.range[1]']]
+            for figure in figures:
+                figure['layout']['xaxis'] = {**figure['layout']['xaxis'], 'range': x_range}
+
+        # Cached serialized, along with the trace and point counts restyling needs, so a hit is not encoded again
+        return [
+            (dumps(figure), len(figure['data']), sum(typed_array_length(trace['y']) for trace in figure['data']))
+            for figure in figures
+        ]
+
+    def figures():
+        return figure_cache.get_or_compute(
+            current.content_key,
+            (
+                selected_dataset, view_type, value_graph_type, trends_graph_type,
+                start_year, end_year, max_points, window, webgl_threshold,
+            ),
+            render,
+        )
+
+    # Only the graph types changed on figures already showing this data, so restyle the traces in place
+    style_only = set(ctx.triggered_prop_ids.values()) <= {"ctl-value-graph-type", "ctl-trends-graph-type"}
+    if style_only and rendered and rendered['key'] == data_key:
+        updates = []
+        for index, (graph_type, rendered_type) in enumerate(zip(graph_types, rendered['types'])):
+            if graph_type == rendered_type:
+                updates.append(no_update)
+            elif graph_type in linear_graph_types and rendered_type in linear_graph_types:
+                # The same trace type the figure would be built with, WebGL lines included
+                patch = Patch()
+                trace_type = linear_trace_type(graph_type, rendered['points'][index], webgl_threshold)
+                for trace in range(rendered['traces'][index]):
+                    patch['data'][trace]['type'] = trace_type
+                updates.append(patch)
+            else:
+                # Heatmaps and linear graphs have different traces, only the switched figure is sent in full
+                serialized, rendered['traces'][index], rendered['points'][index] = figures()[index]
+                updates.append(embed(serialized))
+
+        return *updates, {**rendered, 'types': graph_types}
+
+    if (rendered_figures := figures()) is None:
+        return None, None, None
+
+    return *(embed(serialized) for serialized, _, _ in rendered_figures), {
+        'key': data_key, 'types': graph_types,
+        'traces': [traces for _, traces, _ in rendered_figures],
+        'points': [points for _, _, points in rendered_figures],
     }
 
-    if (key := (selected_dataset, view_type)) in graph_func_map:
-        return graph_func_map[key](filtered_df, value_graph_type, trends_graph_type)
 
+# CB: Data selection >> Download link
+app.clientside_callback(
+    ClientsideFunction(namespace="ui", function_name="update_export_link"),
+    Output("lnk-export-data", "href"),
+    Input("store-selection", "data"),
+    Input("ctl-export-format", "value"),
+)
+
+
+# CB: Data selection >> Range summary
+@app.callback(
+    Output("disp-data-summary", "children"),
+    Input("store-selection", "data"),
+)
+def update_data_summary(selection):
+    if not data_provider.ready or not selection:
+        return None
+
+    dataset, start_year, end_year = selection['dataset'], selection['start'], selection['end']
+
+    # Answered from the tables built when the datasets were published, without touching the rows
+    series, value_format = summary_series[dataset]
+    summary = data_provider.current.range_stats[dataset].summary(start_year, end_year, [column for column, _ in series])
+
+    def value(number) -> str:
+        return "-" if number is None else value_format.format(number)
+
+    def percent(number) -> str:
+        return "-" if number is None else f"{number:+.1%}"
+
+    return html.Table(
+        className="summary-table",
+        children=[
+            html.Thead(html.Tr([html.Th(header) for header in ("", "Mean", "Min", "Max", "Change", "CAGR")])),
+            html.Tbody([
+                html.Tr([
+                    html.Th(name),
+                    html.Td(value(summary[column]['mean'])),
+                    html.Td(value(summary[column]['min'])),
+                    html.Td(value(summary[column]['max'])),
+                    html.Td(percent(summary[column]['change'])),
+                    html.Td(percent(summary[column]['cagr'])),
+                ])
+                for column, name in series
+            ]),
+        ],
+    )
+
+
+@server.route("/healthz")
+def healthz():
+    return flask.jsonify(status="ok")
+
+
+@server.route("/readyz")
+def readyz():
+    data_provider.start()
+    if not data_provider.ready:
+        return flask.jsonify(status="loading", error=data_provider.error), 503
+
+    return flask.jsonify(status="ready", version=data_provider.current.version)
+
+
+@server.route("/export/<dataset>.<export_format>")
+def export_data(dataset, export_format):
+    if dataset not in datasets_label or export_format not in export_formats:
+        flask.abort(404)
+    if not data_provider.ready:
+        return flask.jsonify(status="loading", error=data_provider.error), 503
+
+    current = data_provider.current
+    years = current.year_indexes[dataset].years
+    start_year = flask.request.args.get('start', years[0], type=int)
+    end_year = flask.request.args.get('end', years[-1], type=int)
+
+    # Written out chunk by chunk from a view of the range, the full output never exists at once
+    schema = schemas[dataset]
+    columns = [*schema['keys'], *schema['values'], *schema['derived']]
+    dataframe = current.year_range(dataset, start_year, end_year, schema['derived'])
+    return flask.Response(
+        iter_export(dataframe, columns, export_format, export_config.get('chunk_rows', 10000)),
+        mimetype=export_formats[export_format][1],
+        headers={'Content-Disposition': f'attachment; filename="{dataset}_{start_year}_{end_year}.{export_format}"'},
+    )
+
+
+instrument(app)
+# Response hooks run in reverse order of registration: the serialized figures are spliced in, the body compressed,
+# and then the metrics hooks see the final response size
+install_compression(app, **load_config().get('compression', {}))
+install_serializer(app, **load_config().get('serialization', {}))
 
 if __name__ == "__main__":
+    data_provider.start()
     app.run_server(debug=False)
@@ -0,0 +1,79 @@
+import os
+import time
+
+import flask
+from prometheus_client import CONTENT_TYPE_LATEST
+from prometheus_client import CollectorRegistry
+from prometheus_client import Counter
+from prometheus_client import Gauge
+from prometheus_client import Histogram
+from prometheus_client import REGISTRY
+from prometheus_client import generate_latest
+from prometheus_client import multiprocess
+
+__all__ = [
+    'callback_duration', 'callback_response_bytes', 'figure_cache_lookups',
+    'dataset_rows', 'dataset_version', 'dataset_load_duration', 'dataset_load_failures', 'instrument',
+]
+
+callback_duration = Histogram(
+    'dash_callback_duration_seconds', "Server time per Dash callback request", ['callback'],
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+callback_response_bytes = Histogram(
+    'dash_callback_response_bytes', "Body size of Dash callback responses", ['callback'],
+    buckets=(256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216),
+)
+figure_cache_lookups = Counter(
+    'figure_cache_lookups', "Figure cache lookups by result", ['result'],
+)
+dataset_rows = Gauge(
+    'dataset_rows', "Rows in the published dataset", ['dataset'], multiprocess_mode='livemostrecent',
+)
+dataset_version = Gauge(
+    'dataset_version', "Version number of the published datasets", multiprocess_mode='livemax',
+)
+dataset_load_duration = Histogram(
+    'dataset_load_duration_seconds', "Time to load or refresh the datasets", ['kind', 'source'],
+    buckets=(0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300),
+)
+dataset_load_failures = Counter(
+    'dataset_load_failures', "Failed attempts to load or refresh the datasets", ['kind'],
+)
+
+
+def __metrics_response() -> flask.Response:
+    # Under gunicorn every worker writes its samples to PROMETHEUS_MULTIPROC_DIR, any of them can merge and serve all
+    if 'PROMETHEUS_MULTIPROC_DIR' in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+
+    return flask.Response(generate_latest(registry), mimetype=CONTENT_TYPE_LATEST)
+
+
+def instrument(app) -> None:
+    # Time and size every callback request, labelled with the name of the function that serves it
+    callback_names = {
+        output: getattr(callback.get('callback'), '__name__', output)
+        for output, callback in app.callback_map.items()
+    }
+    server = app.server
+    update_component_path = f"{app.config.routes_pathname_prefix}_dash-update-component"
+
+    @server.before_request
+    def start_timer() -> None:
+        if flask.request.path == update_component_path:
+            flask.g.callback_start = time.perf_counter()
+
+    @server.after_request
+    def record_callback(response: flask.Response) -> flask.Response:
+        if 'callback_start' in flask.g:
+            body = flask.request.get_json(silent=True) or {}
+            callback = callback_names.get(body.get('output'), 'unknown')
+            callback_duration.labels(callback).observe(time.perf_counter() - flask.g.callback_start)
+            callback_response_bytes.labels(callback).observe(response.content_length or 0)
+        return response
+
+    server.add_url_rule('/metrics', 'metrics', __metrics_response)
@@ -0,0 +1,111 @@
+from typing import Callable
+from typing import Dict
+from typing import Iterable
+from typing import List
+from typing import Mapping
+from typing import Optional
+from typing import Tuple
+
+import numpy as np
+
+__all__ = ['RangeStats']
+
+
+class RangeStats:
+    def __init__(self, year_column: np.ndarray, time_column: np.ndarray, columns: Mapping[str, np.ndarray]) -> None:
+        # Expects the rows to be sorted by year, as DataProvider publishes them. Ranges always cover whole years, so
+        # every column is reduced to one entry per year first, and the tables below are only as long as the years
+        years, starts = np.unique(year_column, return_index=True)
+
+        self.__positions = {year: position for position, year in enumerate(years.tolist())}
+        self.__sorted_years = years
+        self.__columns = {
+            name: self.__column_stats(np.asarray(values, dtype=np.float64), np.asarray(time_column), starts)
+            for name, values in columns.items()
+        }
+
+    @classmethod
+    def __column_stats(cls, values: np.ndarray, times: np.ndarray, starts: np.ndarray) -> dict:
+        if not len(values):
+            return {'sums': np.zeros(1), 'counts': np.zeros(1, dtype=np.int64)}
+
+        valid = ~np.isnan(values)
+        rows = np.arange(len(values))
+        counts = np.add.reduceat(valid.astype(np.int64), starts)
+        first_rows = np.minimum.reduceat(np.where(valid, rows, len(values) - 1), starts)
+        last_rows = np.maximum.reduceat(np.where(valid, rows, 0), starts)
+
+        # Position of the nearest year holding a value, at or after and at or before every year
+        positions = np.arange(len(starts))
+        has_values = counts > 0
+        next_years = np.minimum.accumulate(np.where(has_values, positions, len(starts))[::-1])[::-1]
+        previous_years = np.maximum.accumulate(np.where(has_values, positions, -1))
+
+        return {
+            # Prefix sums over the years, the sum and count of any run of years is the difference of two entries
+            'sums': np.concatenate(([0.0], np.cumsum(np.add.reduceat(np.where(valid, values, 0.0), starts)))),
+            'counts': np.concatenate(([0], np.cumsum(counts))),
+            # fmin and fmax skip NaN, a year without values only stays NaN until combined with one that has some
+            'min': cls.__sparse_table(np.fmin.reduceat(values, starts), np.fmin),
+            'max': cls.__sparse_table(np.fmax.reduceat(values, starts), np.fmax),
+            'first': (values[first_rows], times[first_rows]),
+            'last': (values[last_rows], times[last_rows]),
+            'next_years': next_years,
+            'previous_years': previous_years,
+        }
+
+    @staticmethod
+    def __sparse_table(values: np.ndarray, combine: Callable) -> List[np.ndarray]:
+        # Level k combines the 2 ** k years from each position, any range is covered by two overlapping entries
+        table = [values]
+        while 2 ** len(table) <= len(values):
+            width = 2 ** (len(table) - 1)
+            table.append(combine(table[-1][:-width], table[-1][width:]))
+        return table
+
+    @staticmethod
+    def __query(table: List[np.ndarray], combine: Callable, start: int, stop: int) -> float:
+        level = (stop - start).bit_length() - 1
+        return float(combine(table[level][start], table[level][stop - 2 ** level]))
+
+    def __bounds(self, start_year: int, end_year: int) -> Tuple[int, int]:
+        # Year positions [start, stop) of the years within [start_year, end_year]
+        if start_year in self.__positions and end_year in self.__positions:
+            start, stop = self.__positions[start_year], self.__positions[end_year] + 1
+        else:
+            start = int(np.searchsorted(self.__sorted_years, start_year, side='left'))
+            stop = int(np.searchsorted(self.__sorted_years, end_year, side='right'))
+
+        return (start, stop) if start < stop else (0, 0)
+
+    def summary(
+            self, start_year: int, end_year: int, columns: Optional[Iterable[str]] = None,
+    ) -> Dict[str, Dict[str, Optional[float]]]:
+        # Mean, min, max, first and last value, change between them and its compound annual growth rate, per column
+        # of the rows within [start_year, end_year]. None where the range holds no value to compute it from
+        start, stop = self.__bounds(start_year, end_year)
+        return {
+            name: self.__summarize(self.__columns[name], start, stop)
+            for name in (self.__columns if columns is None else columns)
+        }
+
+    def __summarize(self, stats: dict, start: int, stop: int) -> Dict[str, Optional[float]]:
+        count = int(stats['counts'][stop] - stats['counts'][start])
+        if not count:
+            return {'count': 0, **dict.fromkeys(('mean', 'min', 'max', 'first', 'last', 'change', 'cagr'))}
+
+        first_year, last_year = stats['next_years'][start], stats['previous_years'][stop - 1]
+        first, first_time = (float(array[first_year]) for array in stats['first'])
+        last, last_time = (float(array[last_year]) for array in stats['last'])
+        elapsed = last_time - first_time
+
+        return {
+            'count': count,
+            'mean': float(stats['sums'][stop] - stats['sums'][start]) / count,
+            'min': self.__query(stats['min'], np.fmin, start, stop),
+            'max': self.__query(stats['max'], np.fmax, start, stop),
+            'first': first,
+            'last': last,
+            'change': last / first - 1 if first else None,
+            'cagr': (last / first) ** (1 / elapsed) - 1 if first > 0 and last > 0 and elapsed > 0 else None,
+        }
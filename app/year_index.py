@@ -0,0 +1,29 @@
+from typing import List
+from typing import Tuple
+
+import numpy as np
+
+__all__ = ['YearIndex']
+
+
+class YearIndex:
+    def __init__(self, year_column: np.ndarray) -> None:
+        # Expects the rows to be sorted by year, as DataProvider publishes them
+        years, starts = np.unique(year_column, return_index=True)
+
+        self.years: List[int] = years.tolist()
+        self.__offsets = dict(zip(self.years, zip(starts.tolist(), [*starts[1:].tolist(), len(year_column)])))
+        self.__sorted_years = years
+
+    def bounds(self, start_year: int, end_year: int) -> Tuple[int, int]:
+        # Row offsets [start, stop) of the rows whose year falls within [start_year, end_year]
+        if start_year in self.__offsets and end_year in self.__offsets:
+            start, stop = self.__offsets[start_year][0], self.__offsets[end_year][1]
+        else:
+            start_pos = np.searchsorted(self.__sorted_years, start_year, side='left')
+            end_pos = np.searchsorted(self.__sorted_years, end_year, side='right')
+            if start_pos >= end_pos:
+                return 0, 0
+            start, stop = self.__offsets[self.years[start_pos]][0], self.__offsets[self.years[end_pos - 1]][1]
+
+        return (start, stop) if start < stop else (0, 0)
@@ -0,0 +1,76 @@
+"""Serialized figure size per dataset, view and graph type, checked against a stored budget
+
+    python -m benchmarks.bench_payload            # fail if any figure grew past its budget
+    python -m benchmarks.bench_payload --update   # record the current sizes as the new budget
+"""
+import argparse
+import json
+import sys
+from pathlib import Path
+from typing import Dict
+
+from plotly.io.json import to_json_plotly
+
+from app.graph_helper import compose_housing_graph
+from app.graph_helper import compose_lm_graph
+from app.graph_helper import compose_travel_graph
+from app.graph_helper import general_housing_graph
+from app.graph_helper import general_lm_graph
+from app.graph_helper import general_travel_graph
+from benchmarks.synthetic import synthetic_datasets
+
+budget_file = Path(__file__).parent / 'payload_budget.json'
+tolerance = 1.05
+
+graph_func_map = {
+    ('housing_data', 'general'): general_housing_graph,
+    ('housing_data', 'compose'): compose_housing_graph,
+    ('travel_data', 'general'): general_travel_graph,
+    ('travel_data', 'compose'): compose_travel_graph,
+    ('lm_data', 'general'): general_lm_graph,
+    ('lm_data', 'compose'): compose_lm_graph,
+}
+graph_types = {
+    'general': [('line', 'bar')],
+    'compose': [('line', 'bar'), ('heatmap', 'heatmap')],
+}
+
+
+def measure(scales) -> Dict[str, int]:
+    sizes = {}
+    for scale in scales:
+        datasets = synthetic_datasets(scale)
+        for (dataset, view), graph_func in graph_func_map.items():
+            for value_graph_type, trends_graph_type in graph_types[view]:
+                figures = graph_func(datasets[dataset], value_graph_type, trends_graph_type)
+                key = f'{scale:g}x/{dataset}/{view}/{value_graph_type}+{trends_graph_type}'
+                sizes[key] = len(to_json_plotly(figures))
+    return sizes
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scales', type=float, nargs='+', default=[1, 10])
+    parser.add_argument('--update', action='store_true', help="Overwrite the stored budget")
+    args = parser.parse_args()
+
+    sizes = measure(args.scales)
+
+    if args.update:
+        budget_file.write_text(json.dumps(sizes, indent=2) + '\n')
+        print(f"Recorded {len(sizes)} figure sizes in {budget_file.name}")
+        return
+
+    budget = json.loads(budget_file.read_text()) if budget_file.exists() else {}
+    failures = 0
+    for key, size in sizes.items():
+        limit = budget.get(key)
+        over = limit is not None and size > limit * tolerance
+        failures += over
+        print(f"{key:<52} {size:>9,} B  budget {limit if limit is not None else '-':>9}{'  OVER' if over else ''}")
+
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,52 @@
+"""Heatmap z-matrix construction: per-cell boolean masks vs. the vectorized pivot
+
+    python -m benchmarks.bench_pivot --years 50 500
+"""
+import argparse
+import timeit
+
+import numpy as np
+
+from app.graph_helper.data_pivot import pivot_year_grid
+from benchmarks.synthetic import BASE_YEARS
+from benchmarks.synthetic import synthetic_datasets
+
+
+def masked_grid(dataframe, key_column, value_column):
+    # The nested loop the compose heatmaps used before the pivot engine
+    data_mat = []
+    for key in dataframe[key_column].unique():
+        row = []
+        for year in dataframe['year'].unique():
+            value = dataframe[value_column][(dataframe['year'] == year) & (dataframe[key_column] == key)]
+            row.append(value.values[0] if not value.empty else None)
+        data_mat.append(row)
+    return data_mat
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--years', type=int, nargs='+', default=[50, 500])
+    args = parser.parse_args()
+
+    cases = [('housing_data', 'month', 'value_ldn'), ('travel_data', 'period', 'total_journeys')]
+
+    print(f"{'dataset':>12} {'years':>6} {'masked':>10} {'pivot':>10} {'speedup':>9}")
+    for years in args.years:
+        for dataset, key_column, value_column in cases:
+            dataframe = synthetic_datasets(years / BASE_YEARS[dataset])[dataset]
+
+            expected = np.array(masked_grid(dataframe, key_column, value_column), dtype=float)
+            assert np.array_equal(pivot_year_grid(dataframe, key_column, value_column)[2], expected, equal_nan=True)
+
+            runs = max(1, 200 // years)
+            masked = timeit.timeit(lambda: masked_grid(dataframe, key_column, value_column), number=runs) / runs
+            pivot = min(timeit.repeat(
+                lambda: pivot_year_grid(dataframe, key_column, value_column), number=20, repeat=5,
+            )) / 20
+
+            print(f"{dataset:>12} {years:>6} {masked * 1e3:>8.1f}ms {pivot * 1e3:>8.3f}ms {masked / pivot:>8.0f}x")
+
+
+if __name__ == '__main__':
+    main()
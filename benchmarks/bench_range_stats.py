@@ -0,0 +1,78 @@
+"""Range summary per query: scanning the rows of the year range with pandas vs. RangeStats' precomputed tables,
+and what building the tables costs once per dataset version
+
+    python -m benchmarks.bench_range_stats --scales 1 10 100
+"""
+import argparse
+import random
+import timeit
+
+import numpy as np
+import pandas as pd
+
+from app.data_schema import fractional_years
+from app.data_schema import schemas
+from app.range_stats import RangeStats
+from app.year_index import YearIndex
+from benchmarks.synthetic import synthetic_datasets
+
+
+def scan_summary(dataframe: pd.DataFrame, times: np.ndarray, columns) -> dict:
+    # What the panel would do without the tables: reduce every row in the range, per column
+    summary = {}
+    for column in columns:
+        values = dataframe[column]
+        valid = values.notna().to_numpy()
+        first, last = values.iloc[valid.argmax()], values.iloc[len(valid) - 1 - valid[::-1].argmax()]
+        elapsed = times[len(valid) - 1 - valid[::-1].argmax()] - times[valid.argmax()]
+        summary[column] = {
+            'mean': values.mean(), 'min': values.min(), 'max': values.max(),
+            'change': last / first - 1,
+            'cagr': (last / first) ** (1 / elapsed) - 1 if first > 0 and last > 0 and elapsed > 0 else None,
+        }
+    return summary
+
+
+def _seconds(func) -> float:
+    number = max(1, int(0.05 / max(timeit.timeit(func, number=1), 1e-6)))
+    return min(timeit.repeat(func, number=number, repeat=5)) / number
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scales', type=float, nargs='+', default=[1, 10, 100])
+    parser.add_argument('--queries', type=int, default=200, help="Random year ranges timed per dataset")
+    args = parser.parse_args()
+
+    print(f"{'case':<24} {'rows':>10} {'build':>10} {'scan/query':>12} {'tables/query':>14} {'speedup':>9}")
+    for scale in args.scales:
+        for dataset, dataframe in synthetic_datasets(scale, derived=False).items():
+            columns = schemas[dataset]['values']
+            times = fractional_years(dataset, dataframe)
+
+            def build() -> RangeStats:
+                return RangeStats(
+                    dataframe['year'].to_numpy(), times, {column: dataframe[column].to_numpy() for column in columns},
+                )
+
+            stats, year_index = build(), YearIndex(dataframe['year'].to_numpy())
+            ranges = [sorted(random.Random(seed).choices(year_index.years, k=2)) for seed in range(args.queries)]
+
+            def scan() -> None:
+                for start_year, end_year in ranges:
+                    start, stop = year_index.bounds(start_year, end_year)
+                    scan_summary(dataframe.iloc[start:stop], times[start:stop], columns)
+
+            def tables() -> None:
+                for start_year, end_year in ranges:
+                    stats.summary(start_year, end_year, columns)
+
+            scan_seconds, table_seconds = _seconds(scan) / len(ranges), _seconds(tables) / len(ranges)
+            print(
+                f"{f'{scale:g}x/{dataset}':<24} {len(dataframe):>10,} {_seconds(build) * 1e3:>8.2f}ms "
+                f"{scan_seconds * 1e6:>10.1f}us {table_seconds * 1e6:>12.1f}us {scan_seconds / table_seconds:>8.1f}x"
+            )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,52 @@
+"""Figure encode time and size per dataset and view: plotly's json and orjson engines vs. app.figure_json.dumps
+
+A cache hit skips encoding altogether, the cached bytes are spliced into the callback response.
+
+    python -m benchmarks.bench_serialize --scales 1 10 100
+"""
+import argparse
+import timeit
+
+from plotly.io.json import to_json_plotly
+
+from app.figure_json import dumps
+from benchmarks.bench_payload import graph_func_map
+from benchmarks.bench_payload import graph_types
+from benchmarks.synthetic import synthetic_datasets
+
+encoders = {
+    'plotly json': lambda figure: to_json_plotly(figure, engine='json'),
+    'plotly orjson': lambda figure: to_json_plotly(figure, engine='orjson'),
+    'figure_json': dumps,
+}
+
+
+def _seconds(func) -> float:
+    number = max(1, int(0.05 / max(timeit.timeit(func, number=1), 1e-6)))
+    return min(timeit.repeat(func, number=number, repeat=5)) / number
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scales', type=float, nargs='+', default=[1, 10, 100])
+    args = parser.parse_args()
+
+    print(f"{'case':<48}" + ''.join(f"{name:>24}" for name in encoders))
+    for scale in args.scales:
+        datasets = synthetic_datasets(scale)
+        for (dataset, view), graph_func in graph_func_map.items():
+            for value_graph_type, trends_graph_type in graph_types[view]:
+                figures = graph_func(datasets[dataset], value_graph_type, trends_graph_type)
+
+                cells = []
+                for encode in encoders.values():
+                    seconds = _seconds(lambda: [encode(figure) for figure in figures])
+                    size = sum(len(encode(figure)) for figure in figures)
+                    cells.append(f"{seconds * 1e3:>9.3f}ms {size:>10,} B")
+
+                case = f'{scale:g}x/{dataset}/{view}/{value_graph_type}+{trends_graph_type}'
+                print(f"{case:<48}" + ''.join(f"{cell:>24}" for cell in cells))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,261 @@
+"""Time, peak memory and payload size of the graph helpers and callbacks, checked against a stored baseline
+
+Runs offline: each scale gets a fresh process whose app serves synthetic datasets from a temporary
+snapshot, with the API server pointed at a closed port.
+
+    python -m benchmarks.bench_suite                       # fail if anything regressed past the baseline
+    python -m benchmarks.bench_suite --scales 1 10         # a quicker subset
+    python -m benchmarks.bench_suite --update              # record the current results as the new baseline
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Callable
+from typing import Dict
+from typing import Optional
+
+from benchmarks.synthetic import synthetic_datasets
+
+baseline_file = Path(__file__).parent / 'bench_baseline.json'
+callbacks_js = Path(__file__).parent.parent / 'app' / 'assets' / 'callbacks.js'
+
+# A result fails when it exceeds the baseline by both the ratio and the absolute margin.
+# Timings are only comparable on the machine that recorded the baseline, and loose enough to ride out its noise
+tolerance = {
+    'seconds': (2.0, 2e-3),
+    'peak_bytes': (1.25, 64 * 2 ** 10),
+    'payload_bytes': (1.05, 0),
+}
+
+graph_types = {
+    'general': [('line', 'bar')],
+    'compose': [('line', 'bar'), ('heatmap', 'heatmap')],
+}
+
+# Calls the clientside range callbacks directly, the only part of them that does any work. A dataset change runs
+# both: the selection is normalized, then the options, the slider and the selection store follow from it
+node_script = r"""
+const fs = require('fs');
+global.window = {};
+eval(fs.readFileSync(process.argv[1], 'utf8'));
+const {normalize_date_range, update_date_range} = window.dash_clientside.ui;
+const callback = (dataset, startDate, endDate, yearRanges) => update_date_range(
+    ...normalize_date_range(dataset, yearRanges, startDate, endDate), dataset, yearRanges,
+);
+const yearRanges = JSON.parse(fs.readFileSync(0, 'utf8'));
+const results = {};
+for (const dataset of Object.keys(yearRanges)) {
+    const years = yearRanges[dataset];
+    const mid = years[Math.floor(years.length / 2)];
+    const run = () => callback(dataset, mid, years[years.length - 1], yearRanges);
+    let best = Infinity;
+    for (let repeat = 0; repeat < 5; repeat++) {
+        const calls = 20, start = process.hrtime.bigint();
+        for (let i = 0; i < calls; i++) run();
+        best = Math.min(best, Number(process.hrtime.bigint() - start) / 1e9 / calls);
+    }
+    results[dataset] = {seconds: best, payload_bytes: JSON.stringify(run()).length};
+}
+process.stdout.write(JSON.stringify(results));
+"""
+
+
+def _time(func: Callable, setup: Optional[Callable] = None, budget: float = 0.2) -> float:
+    # Best of several runs, repeated until the time budget is spent
+    best, spent, runs = float('inf'), 0.0, 0
+    while runs < 3 or (spent < budget and runs < 100):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        best, spent, runs = min(best, elapsed), spent + elapsed, runs + 1
+    return best
+
+
+def _peak(func: Callable, setup: Optional[Callable] = None) -> int:
+    if setup is not None:
+        setup()
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def _offline_app(directory: Path, scale: float, config: str = ''):
+    # Point the app at a config in `directory` before anything reads it, then import it
+    from app.data_snapshot import DataSnapshot
+
+    datasets = synthetic_datasets(scale, derived=False)
+    DataSnapshot(directory / '.snapshot').save(datasets, {
+        'api': 'synthetic',
+        'datasets': {dataset: {'rows': len(dataframe), 'digest': ''} for dataset, dataframe in datasets.items()},
+    })
+    (directory / 'app_config.toml').write_text(
+        '[fetch]\nretries = 0\ntimeout = 1\n\n[refresh]\ninterval = 0\n\n[cache]\nmax_bytes = 1073741824\n' + config
+    )
+    os.environ['APP_CONFIG_FILE'] = str(directory / 'app_config.toml')
+    os.environ['BACKEND_SERVER_URL'] = 'http://127.0.0.1:9'
+
+    import app.main
+    app.main.data_provider.wait()
+    return app.main
+
+
+def _graph_requests(
+        main, dataset: str, view: str, value_graph_type: str, trends_graph_type: str, headers: Optional[dict] = None,
+) -> dict:
+    client = main.server.test_client()
+    output, callback = next(
+        (output, callback) for output, callback in main.app.callback_map.items()
+        if getattr(callback.get('callback'), '__name__', None) == 'update_data_value'
+    )
+    output_spec = [dict(zip(('id', 'property'), o.rsplit('.', 1))) for o in output.strip('.').split('...')]
+    years = main.data_provider.current.year_indexes[dataset].years
+    values = {
+        'store-selection': {'dataset': dataset, 'start': years[0], 'end': years[-1]}, 'ctl-view-mode-sel': view,
+        'ctl-value-graph-type': value_graph_type, 'ctl-trends-graph-type': trends_graph_type, 'store-graph-width': 800,
+    }
+
+    def post(changed: str, rendered=None, headers: Optional[dict] = headers):
+        response = client.post('/_dash-update-component', json={
+            'output': output,
+            'outputs': output_spec,
+            'inputs': [{**i, 'value': values.get(i['id'])} for i in callback['inputs']],
+            'state': [{**s, 'value': rendered} for s in callback['state']],
+            'changedPropIds': [changed],
+        }, headers=headers)
+        assert response.status_code == 200, response.data[:200]
+        return response
+
+    rendered = post('store-selection.data', headers=None).get_json()['response']['store-rendered-figures']['data']
+    flipped = {'line': 'bar', 'bar': 'line', 'heatmap': 'line'}[value_graph_type]
+
+    def restyle():
+        values['ctl-value-graph-type'] = flipped
+        try:
+            return post('ctl-value-graph-type.value', rendered)
+        finally:
+            values['ctl-value-graph-type'] = value_graph_type
+
+    return {
+        'render': (lambda: post('store-selection.data'), main.figure_cache.clear),
+        'cached': (lambda: post('store-selection.data'), None),
+        'restyle': (restyle, None),
+    }
+
+
+def run_scale(scale: float) -> Dict[str, dict]:
+    from plotly.io.json import to_json_plotly
+
+    from app import graph_helper
+
+    results = {}
+    directory = Path(tempfile.mkdtemp(prefix='bench-suite-'))
+    try:
+        main = _offline_app(directory, scale)
+        current = main.data_provider.current
+
+        for dataset in current.datasets:
+            short_name = dataset.removesuffix('_data')
+            for view, combinations in graph_types.items():
+                helper = getattr(graph_helper, f'{view}_{short_name}_graph')
+                dataframe = current.frame(dataset, main.graph_columns[helper])
+                for value_graph_type, trends_graph_type in combinations:
+                    suffix = f'{dataset}/{view}/{value_graph_type}+{trends_graph_type}'
+
+                    def build():
+                        return helper(dataframe, value_graph_type, trends_graph_type)
+
+                    results[f'{scale:g}x/{helper.__name__}/{suffix}'] = {
+                        'seconds': _time(build),
+                        'peak_bytes': _peak(build),
+                        'payload_bytes': len(to_json_plotly(build())),
+                    }
+
+                    for name, (call, setup) in _graph_requests(
+                            main, dataset, view, value_graph_type, trends_graph_type,
+                    ).items():
+                        results[f'{scale:g}x/update_data_value:{name}/{suffix}'] = {
+                            'seconds': _time(call, setup),
+                            'peak_bytes': _peak(call, setup),
+                            'payload_bytes': len(call().data),
+                        }
+
+        year_ranges = {dataset: index.years for dataset, index in current.year_indexes.items()}
+        if shutil.which('node'):
+            clientside = json.loads(subprocess.run(
+                ['node', '-e', node_script, str(callbacks_js)],
+                input=json.dumps(year_ranges), capture_output=True, text=True, check=True,
+            ).stdout)
+            for dataset, result in clientside.items():
+                results[f'{scale:g}x/update_date_range/{dataset}'] = result
+        else:
+            print("node not found, skipping the clientside update_date_range timings")
+
+        results[f'{scale:g}x/store-year-ranges'] = {'payload_bytes': len(json.dumps(year_ranges))}
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+    return results
+
+
+def _regressions(result: dict, baseline: dict) -> list:
+    over = []
+    for metric, value in result.items():
+        ratio, margin = tolerance[metric]
+        if (limit := baseline.get(metric)) is not None and value > limit * ratio and value - limit > margin:
+            over.append(metric)
+    return over
+
+
+def _format(result: dict) -> str:
+    seconds = f"{result['seconds'] * 1e3:>10.3f} ms" if 'seconds' in result else ' ' * 13
+    peak = f"{result['peak_bytes'] / 2 ** 20:>9.2f} MiB" if 'peak_bytes' in result else ' ' * 13
+    return f"{seconds} {peak} {result['payload_bytes']:>12,} B"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scales', type=float, nargs='+', default=[1, 10, 100, 1000])
+    parser.add_argument('--update', action='store_true', help="Merge the results into the stored baseline")
+    args = parser.parse_args()
+
+    results = {}
+    context = multiprocessing.get_context('spawn')
+    for scale in args.scales:
+        with context.Pool(1) as pool:
+            results.update(pool.apply(run_scale, (scale,)))
+
+    baseline = json.loads(baseline_file.read_text()) if baseline_file.exists() else {}
+
+    if args.update:
+        baseline.update(results)
+        baseline_file.write_text(json.dumps(baseline, indent=2, sort_keys=True) + '\n')
+        print(f"Recorded {len(results)} results in {baseline_file.name}")
+        return
+
+    failures = 0
+    for key, result in results.items():
+        over = _regressions(result, baseline.get(key, {}))
+        failures += bool(over)
+        flag = f"  SLOWER ({', '.join(over)})" if over else ('' if key in baseline else '  (no baseline)')
+        print(f"{key:<76} {_format(result)}{flag}")
+
+    if failures:
+        print(f"{failures} of {len(results)} results regressed past the baseline")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
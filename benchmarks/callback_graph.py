@@ -0,0 +1,250 @@
+"""Callback executions per user interaction: clientside calls, server round trips, responses carrying figures and
+figure renders, replayed against the app on synthetic data
+
+Interactions are replayed the way dash-renderer schedules callbacks: every prop a callback returns requests the
+callbacks that take it as an input, a requested callback waits while any pending callback could still change one of
+its inputs, requests of the same callback are merged, and a callback is not requested again by its own chain.
+Server callbacks are posted to the app, clientside ones run in node against app/assets/callbacks.js. The figure
+cache is cleared before every interaction, so each render is counted.
+
+    python -m benchmarks.callback_graph --scale 100
+"""
+import argparse
+import json
+import shutil
+import subprocess
+import tempfile
+from collections import Counter
+from pathlib import Path
+from typing import Dict
+from typing import List
+from typing import Optional
+from typing import Tuple
+
+from dash.development.base_component import Component
+
+Prop = Tuple[str, str]
+
+clientside_runner = """
+const noUpdate = {__no_update: true};
+global.window = {dash_clientside: {no_update: noUpdate}};
+global.document = {
+    getElementById: () => ({offsetWidth: 1000, textContent: '{"requests_pathname_prefix": "/"}'}),
+};
+eval(require('fs').readFileSync(process.argv[1], 'utf8'));
+require('readline').createInterface({input: process.stdin}).on('line', (line) => {
+    const {namespace, function_name, args, triggered} = JSON.parse(line);
+    window.dash_clientside.callback_context = {triggered: triggered.map((prop_id) => ({prop_id}))};
+    const result = window.dash_clientside[namespace][function_name](...args);
+    process.stdout.write(JSON.stringify(result === undefined ? null : result) + '\\n');
+});
+"""
+
+
+def _props(component, props: Dict[Prop, object]) -> Dict[Prop, object]:
+    if isinstance(component, (list, tuple)):
+        for child in component:
+            _props(child, props)
+    elif isinstance(component, Component):
+        component_id = getattr(component, 'id', None)
+        for name in component._prop_names:
+            value = getattr(component, name, None)
+            if component_id is not None and name != 'children':
+                props[component_id, name] = value
+            if isinstance(value, (Component, list, tuple)):
+                _props(value, props)
+    return props
+
+
+def _prop(spec: dict) -> Prop:
+    return spec['id'], spec['property']
+
+
+class Replay:
+    def __init__(self, main) -> None:
+        self.main = main
+        self.client = main.server.test_client()
+        self.props = _props(main.app.layout(), {})
+        self.callbacks = []
+        for callback in main.app._callback_list:
+            outputs = [tuple(output.rsplit('.', 1)) for output in callback['output'].strip('.').split('...')]
+            self.callbacks.append({
+                **callback,
+                'outputs': outputs,
+                'input_props': [_prop(spec) for spec in callback['inputs']],
+                'state_props': [_prop(spec) for spec in callback['state']],
+                'name': callback['clientside_function']['function_name'] if callback['clientside_function']
+                else main.app.callback_map[callback['output']]['callback'].__name__,
+            })
+
+        self.node = subprocess.Popen(
+            ['node', '-e', clientside_runner, str(Path(main.app.config.assets_folder) / 'callbacks.js')],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True,
+        )
+        self.renders = 0
+        for key, graph_func in list(main.graph_func_map.items()):
+            def counted(*args, graph_func=graph_func):
+                self.renders += 1
+                return graph_func(*args)
+
+            main.graph_func_map[key] = counted
+            # Derived columns are looked up by graph function
+            main.graph_columns[counted] = main.graph_columns.get(graph_func, ())
+
+    def close(self) -> None:
+        self.node.stdin.close()
+        self.node.wait()
+
+    def downstream(self, index: int) -> set:
+        # Every prop the callback could change, directly or through the callbacks its outputs feed
+        outputs, queue = set(), [index]
+        while queue:
+            for output in self.callbacks[queue.pop()]['outputs']:
+                if output not in outputs:
+                    outputs.add(output)
+                    queue += [i for i, callback in enumerate(self.callbacks) if output in callback['input_props']]
+        return outputs
+
+    def __dependencies(self, index: int) -> set:
+        return set(self.callbacks[index]['input_props'] + self.callbacks[index]['state_props'])
+
+    def __execute(self, callback: dict, changed: List[Prop], counts: Counter) -> Dict[Prop, object]:
+        args = [self.props.get(prop) for prop in callback['input_props'] + callback['state_props']]
+        triggered = [f'{component_id}.{name}' for component_id, name in changed]
+
+        if callback['clientside_function']:
+            counts['clientside calls'] += 1
+            self.node.stdin.write(json.dumps({**callback['clientside_function'], 'args': args,
+                                              'triggered': triggered}) + '\n')
+            self.node.stdin.flush()
+            result = json.loads(self.node.stdout.readline())
+            values = result if len(callback['outputs']) > 1 else [result]
+            return {
+                output: value for output, value in zip(callback['outputs'], values)
+                if not (isinstance(value, dict) and value.get('__no_update'))
+            }
+
+        counts['server calls'] += 1
+        specs = [{'id': component_id, 'property': name} for component_id, name in callback['outputs']]
+        response = self.client.post('/_dash-update-component', json={
+            'output': callback['output'],
+            'outputs': specs if len(specs) > 1 else specs[0],
+            'inputs': [{**spec, 'value': self.props.get(_prop(spec))} for spec in callback['inputs']],
+            'state': [{**spec, 'value': self.props.get(_prop(spec))} for spec in callback['state']],
+            'changedPropIds': triggered,
+        })
+        if response.status_code == 204:
+            return {}
+
+        assert response.status_code == 200, (callback['name'], response.status_code)
+        returned = {
+            (component_id, name): value
+            for component_id, props in response.get_json()['response'].items() for name, value in props.items()
+        }
+        counts['figure responses'] += any(name == 'figure' for _, name in returned)
+        return returned
+
+    def run(self, changed: Optional[Dict[Prop, object]]) -> Counter:
+        # None replays the page load, when every callback not preventing its initial call is requested
+        counts, self.renders = Counter(), 0
+        self.main.figure_cache.clear()
+        if changed is None:
+            requested = [
+                (index, [], []) for index, callback in enumerate(self.callbacks)
+                if not callback['prevent_initial_call']
+            ]
+        else:
+            self.props.update(changed)
+            requested = [
+                (index, [prop for prop in changed if prop in callback['input_props']], [])
+                for index, callback in enumerate(self.callbacks)
+                if any(prop in callback['input_props'] for prop in changed)
+            ]
+
+        while requested:
+            merged = {}
+            for index, props, predecessors in requested:
+                if index in predecessors:
+                    continue
+                previous = merged.get(index, (index, [], []))
+                merged[index] = (index, previous[1] + [prop for prop in props if prop not in previous[1]], predecessors)
+            requested = list(merged.values())
+
+            # Outputs a callback shares with its inputs do not hold it back
+            pending = set().union(*(self.downstream(index) for index, _, _ in requested))
+            ready = [
+                request for request in requested
+                if not pending & (self.__dependencies(request[0]) - set(self.callbacks[request[0]]['outputs']))
+            ]
+            assert ready, "no callback can run"
+
+            requested = [request for request in requested if request not in ready]
+            for index, props, predecessors in ready:
+                counts[self.callbacks[index]['name']] += 1
+                returned = self.__execute(self.callbacks[index], props, counts)
+                self.props.update(returned)
+                requested += [
+                    (other, [prop for prop in returned if prop in callback['input_props']], predecessors + [index])
+                    for other, callback in enumerate(self.callbacks)
+                    if any(prop in callback['input_props'] for prop in returned)
+                ]
+
+        counts['renders'] = self.renders
+        return counts
+
+
+def _interactions(replay: Replay) -> List[Tuple[str, Optional[Dict[Prop, object]]]]:
+    datasets = list(replay.props['ctl-dataset-sel', 'options'])
+
+    def option(component_id: str, position: float):
+        options = replay.props[component_id, 'options']
+        return options[int(len(options) * position)]['value']
+
+    def zoom() -> dict:
+        selection = replay.props.get(('store-selection', 'data')) or {
+            'start': replay.props['ctl-year-sel-start', 'value'], 'end': replay.props['ctl-year-sel-end', 'value'],
+        }
+        return {'xaxis.range[0]': f"{selection['start']}-01-01", 'xaxis.range[1]': f"{selection['start'] + 1}-12-31"}
+
+    return [
+        ("page load", lambda: None),
+        ("select dataset", lambda: {('ctl-dataset-sel', 'value'): datasets[1]}),
+        ("select start year", lambda: {('ctl-year-sel-start', 'value'): option('ctl-year-sel-start', 0.5)}),
+        ("select end year", lambda: {('ctl-year-sel-end', 'value'): option('ctl-year-sel-end', 0.5)}),
+        ("select view", lambda: {('ctl-view-mode-sel', 'value'): 'general'}),
+        ("select graph type", lambda: {('ctl-value-graph-type', 'value'): 'bar'}),
+        ("plotly autosize", lambda: {('disp-graph-data-value', 'relayoutData'): {'autosize': True}}),
+        ("zoom", lambda: {('disp-graph-data-value', 'relayoutData'): zoom()}),
+        ("select export format", lambda: {('ctl-export-format', 'value'): 'parquet'}),
+    ]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scale', type=float, default=100, help="History length of the synthetic datasets")
+    parser.add_argument('--verbose', action='store_true', help="Also list the calls of every callback")
+    args = parser.parse_args()
+
+    from benchmarks.bench_suite import _offline_app
+
+    directory = Path(tempfile.mkdtemp(prefix='callback-graph-'))
+    try:
+        replay = Replay(_offline_app(directory, args.scale))
+        try:
+            columns = ('clientside calls', 'server calls', 'figure responses', 'renders')
+            print(f"{'interaction':<22}" + ''.join(f"{column:>18}" for column in columns))
+            for name, change in _interactions(replay):
+                counts = replay.run(change())
+                print(f"{name:<22}" + ''.join(f"{counts[column]:>18}" for column in columns))
+                if args.verbose:
+                    print('    ' + ', '.join(
+                        f"{callback} x{count}" for callback, count in counts.items() if callback not in columns
+                    ))
+        finally:
+            replay.close()
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+"""Exporting a year range: the export routes' chunked generators vs. writing the whole output at once, by peak
+Python memory allocated while producing it, time to the first chunk and total time
+
+The materialized baseline selects the exported columns and writes them with a single to_csv/to_json/to_parquet
+call, as a handler building the file before responding would. Each case exports the full range of a dataset.
+
+    python -m benchmarks.export_stream --scales 10 100 1000
+"""
+import argparse
+import io
+import time
+import tracemalloc
+
+import pandas as pd
+
+from app.data_export import iter_export
+from app.data_schema import materialize_columns
+from app.data_schema import schemas
+from benchmarks.synthetic import synthetic_datasets
+
+
+def materialized(dataframe: pd.DataFrame, columns, export_format: str) -> bytes:
+    selected = dataframe[list(columns)]
+    if export_format == 'csv':
+        return selected.to_csv(index=False).encode()
+    if export_format == 'jsonl':
+        return selected.to_json(orient='records', lines=True).encode()
+    buffer = io.BytesIO()
+    selected.to_parquet(buffer, index=False)
+    return buffer.getvalue()
+
+
+def _measure(produce) -> tuple:
+    # Chunks are dropped once counted, as a response sent to the client would. Tracing slows down formatting done
+    # in Python, so memory is traced in a second pass of its own
+    start = time.perf_counter()
+    first, size = None, 0
+    for chunk in produce():
+        first = first or time.perf_counter() - start
+        size += len(chunk)
+    seconds = time.perf_counter() - start
+
+    tracemalloc.start()
+    for _ in produce():
+        pass
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return size, peak, first, seconds
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scales', type=float, nargs='+', default=[10, 100, 1000])
+    parser.add_argument('--dataset', default='travel_data')
+    parser.add_argument('--chunk-rows', type=int, default=10000)
+    args = parser.parse_args()
+
+    schema = schemas[args.dataset]
+    columns = [*schema['keys'], *schema['values'], *schema['derived']]
+    print(f"{'case':<16} {'mode':<13} {'rows':>10} {'bytes':>14} {'peak memory':>14} {'first chunk':>12} {'time':>9}")
+    for scale in args.scales:
+        dataframe = synthetic_datasets(scale, derived=False)[args.dataset]
+        dataframe = materialize_columns(args.dataset, dataframe, schema['derived'])
+        for export_format in ('csv', 'jsonl', 'parquet'):
+            modes = {
+                'streamed': lambda: iter_export(dataframe, columns, export_format, args.chunk_rows),
+                'materialized': lambda: [materialized(dataframe, columns, export_format)],
+            }
+            for mode, produce in modes.items():
+                size, peak, first, seconds = _measure(produce)
+                print(
+                    f"{f'{scale:g}x/{export_format}':<16} {mode:<13} {len(dataframe):>10,} {size:>14,} "
+                    f"{peak / 2 ** 20:>11.1f}MiB {first * 1e3:>10.1f}ms {seconds:>8.2f}s"
+                )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+"""Local stand-in for the data API, serving synthetic datasets with injectable latency
+
+    python -m benchmarks.fake_api --port 8765 --scale 10 --latency 0.005
+    BACKEND_SERVER_URL=http://localhost:8765 python -m app.main
+"""
+import argparse
+import random
+import time
+from typing import Dict
+from typing import List
+
+import pandas as pd
+from flask import Flask
+from flask import abort
+from flask import jsonify
+from flask import request
+
+from benchmarks.synthetic import synthetic_datasets
+
+# Endpoint name and the columns the live API returns, derived columns are the app's job
+endpoints = {
+    'housing_data': ('housing', {
+        'year': 'year', 'month': 'month', 'value_ldn': 'value_ldn', 'value_uk': 'value_uk',
+        'annual_growth_ldn': 'annual_growth_ldn', 'annual_growth_uk': 'annual_growth_uk',
+    }),
+    'travel_data': ('travel', {
+        'year': 'year', 'period': 'period', 'bus_journeys': 'bus_journeys', 'tube_journeys': 'tube_journeys',
+    }),
+    'lm_data': ('labour-market', {
+        'year': 'quarter_mid_y', 'month': 'quarter_mid_m',
+        'unemployment_rate_ldn': 'unemployment_rate_ldn', 'unemployment_rate_uk': 'unemployment_rate_uk',
+    }),
+}
+
+
+def api_rows(scale: float = 1, seed: int = 0) -> Dict[str, List[dict]]:
+    rows = {}
+    for dataset, dataframe in synthetic_datasets(scale, seed, derived=False).items():
+        name, columns = endpoints[dataset]
+        raw = dataframe[list(columns)].rename(columns=columns).astype(object)
+        rows[name] = raw.where(pd.notna(raw), None).to_dict('records')
+    return rows
+
+
+def create_app(scale: float = 1, latency: float = 0.0, jitter: float = 0.0, bulk: bool = False) -> Flask:
+    app = Flask(__name__)
+    rows = api_rows(scale)
+
+    def delay() -> None:
+        if latency or jitter:
+            time.sleep(max(latency + random.uniform(-jitter, jitter), 0))
+
+    @app.get('/api/v1')
+    def hello():
+        delay()
+        return jsonify({'message': 'hello'})
+
+    @app.get('/api/v1/dataset/<name>')
+    def dataset_index(name: str):
+        if name not in rows:
+            abort(404)
+
+        delay()
+        if bulk:
+            return jsonify([{'uri': f'{request.base_url}/{i}', **row} for i, row in enumerate(rows[name])])
+        return jsonify([{'uri': f'{request.base_url}/{i}'} for i in range(len(rows[name]))])
+
+    @app.get('/api/v1/dataset/<name>/<int:row>')
+    def dataset_row(name: str, row: int):
+        if name not in rows or row >= len(rows[name]):
+            abort(404)
+
+        delay()
+        return jsonify(rows[name][row])
+
+    return app
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--scale', type=float, default=1, help="Multiple of today's dataset history")
+    parser.add_argument('--latency', type=float, default=0.0, help="Seconds added to every response")
+    parser.add_argument('--jitter', type=float, default=0.0, help="Random +/- seconds around the latency")
+    parser.add_argument('--bulk', action='store_true', help="Embed the rows in the dataset index responses")
+    args = parser.parse_args()
+
+    create_app(args.scale, args.latency, args.jitter, args.bulk).run(host=args.host, port=args.port, threaded=True)
+
+
+if __name__ == '__main__':
+    main()
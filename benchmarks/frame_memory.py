@@ -0,0 +1,74 @@
+"""Dataset frame memory with inferred dtypes and eager derived columns vs. the typed schema, as published
+(derived columns materialized on first use) and with every derived column materialized
+
+    python -m benchmarks.frame_memory --scales 1 10 100
+"""
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from app.data_schema import materialize_columns
+from app.data_schema import prepare_dataset
+from app.data_schema import schemas
+from benchmarks.fake_api import api_rows
+from benchmarks.fake_api import endpoints
+
+
+def inferred_frame(dataset: str, rows: list) -> pd.DataFrame:
+    # What DataProvider published before the schema: dtypes as pandas infers them from the rows
+    dataframe = pd.DataFrame(rows)
+    if dataset == 'lm_data':
+        dataframe = dataframe.rename(columns={'quarter_mid_y': 'year', 'quarter_mid_m': 'month'})
+
+    if dataset == 'travel_data':
+        dataframe['annual_growth_bus'] = dataframe['bus_journeys'].pct_change(13)
+        dataframe['annual_growth_tube'] = dataframe['tube_journeys'].pct_change(13)
+        dataframe['total_journeys'] = dataframe['bus_journeys'] + dataframe['tube_journeys']
+        dataframe['annual_growth_total'] = dataframe['total_journeys'].pct_change(13)
+
+    if dataset == 'lm_data':
+        dataframe['annual_growth_ldn'] = dataframe['unemployment_rate_ldn'].pct_change(12)
+        dataframe['annual_growth_uk'] = dataframe['unemployment_rate_uk'].pct_change(12)
+
+    return dataframe
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scales', type=float, nargs='+', default=[1, 10, 100])
+    args = parser.parse_args()
+
+    for scale in args.scales:
+        rows = api_rows(scale)
+        totals = np.zeros(3)
+
+        for dataset, (name, columns) in endpoints.items():
+            before = inferred_frame(dataset, rows[name])
+            published = prepare_dataset(dataset, before)
+            full = materialize_columns(dataset, published, schemas[dataset]['derived'])
+
+            # Same columns, and values the same to within float32 precision
+            assert sorted(before.columns) == sorted(full.columns)
+            for column in full.columns:
+                assert np.allclose(full[column], before[column], rtol=1e-6, equal_nan=True), column
+
+            sizes = np.array([frame.memory_usage(deep=True).sum() for frame in (before, published, full)])
+            totals += sizes
+            print(
+                f"{scale:g}x {dataset:<13} {len(full):>9,} rows  "
+                f"{sizes[0] / 2 ** 10:>10,.1f} KiB -> {sizes[1] / 2 ** 10:>10,.1f} KiB "
+                f"({sizes[2] / 2 ** 10:>10,.1f} KiB materialized)  "
+                f"{', '.join(f'{column}:{dtype}' for column, dtype in full.dtypes.items() if column in columns)}"
+            )
+
+        print(
+            f"{scale:g}x {'total':<13} {'':>14}  "
+            f"{totals[0] / 2 ** 10:>10,.1f} KiB -> {totals[1] / 2 ** 10:>10,.1f} KiB "
+            f"({totals[2] / 2 ** 10:>10,.1f} KiB materialized, {1 - totals[1] / totals[0]:.0%} / "
+            f"{1 - totals[2] / totals[0]:.0%} smaller)\n"
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,129 @@
+"""Peak memory while loading the datasets from the API: rows parsed into dicts and then a DataFrame, vs. rows
+written straight into typed columns as they are parsed
+
+Each load runs in a fresh process against the fake API, once with the rows embedded in the index responses
+and once with a request per row.
+
+    python -m benchmarks.ingest_memory --bulk-scale 100 --row-scale 10
+"""
+import argparse
+import hashlib
+import json
+import multiprocessing
+import resource
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict
+
+import pandas as pd
+
+from benchmarks.load_test import _free_port
+from benchmarks.load_test import _wait_ready
+from benchmarks.load_test import repo_root
+
+
+def _rss_kib() -> int:
+    with open('/proc/self/statm', 'r') as f:
+        return int(f.read().split()[1]) * resource.getpagesize() // 1024
+
+
+def _legacy_frame(fetcher, api_url: str, dataset: str) -> pd.DataFrame:
+    # What DataProvider did before: the whole index parsed into dicts, every row kept as a dict until all are in,
+    # then copied into a DataFrame
+    from app.data_provider import DataProvider
+
+    response = fetcher.get(DataProvider.data_api_endpoints_base[dataset].format(api_server=api_url))
+    index = response.json()
+    hashlib.sha256(response.content).hexdigest()
+    hashlib.sha256(json.dumps(index, sort_keys=True).encode()).hexdigest()
+    if all('uri' not in row or len(row) > 1 for row in index):
+        rows = [{k: v for k, v in row.items() if k != 'uri'} for row in index]
+    else:
+        with ThreadPoolExecutor(max_workers=fetcher.max_workers) as executor:
+            rows = list(executor.map(lambda row: fetcher.get(row['uri']).json(), index))
+
+    dataframe = pd.DataFrame(rows)
+    if dataset == 'lm_data':
+        dataframe = dataframe.rename(columns={'quarter_mid_y': 'year', 'quarter_mid_m': 'month'})
+    return dataframe
+
+
+def _columnar_frame(fetcher, api_url: str, dataset: str) -> pd.DataFrame:
+    from app.data_provider import DataProvider
+    from app.data_schema import schemas
+
+    renamed = DataProvider.api_fields.get(dataset, {})
+    fields = {
+        column: renamed.get(column, column)
+        for column in (*schemas[dataset]['keys'], *schemas[dataset]['values'])
+    }
+    index = fetcher.fetch_index(DataProvider.data_api_endpoints_base[dataset].format(api_server=api_url), fields)
+    return pd.DataFrame(fetcher.fetch_dataset(dataset, index))
+
+
+def _load(api_url: str, path: str, results) -> None:
+    from app.data_fetcher import DataFetcher
+    from app.data_provider import DataProvider
+    from app.data_schema import prepare_dataset
+
+    fetcher = DataFetcher(retries=0, timeout=60)
+    build = _legacy_frame if path == 'legacy' else _columnar_frame
+    before = _rss_kib()
+    start = time.perf_counter()
+
+    datasets = {
+        dataset: prepare_dataset(dataset, build(fetcher, api_url, dataset))
+        for dataset in DataProvider.data_api_endpoints_base
+    }
+
+    results.put({
+        'seconds': time.perf_counter() - start,
+        'peak_kib': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - before,
+        'frame_kib': sum(dataframe.memory_usage(deep=True).sum() for dataframe in datasets.values()) / 1024,
+    })
+    fetcher.close()
+
+
+def measure(api_url: str, path: str) -> Dict[str, float]:
+    context = multiprocessing.get_context('spawn')
+    results = context.Queue()
+    process = context.Process(target=_load, args=(api_url, path, results))
+    process.start()
+    result = results.get()
+    process.join()
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--bulk-scale', type=float, default=100, help="History length served in the index responses")
+    parser.add_argument('--row-scale', type=float, default=10, help="History length served a request per row")
+    args = parser.parse_args()
+
+    print(f"{'endpoint':<14} {'path':<9} {'load':>8} {'peak RSS growth':>16} {'frames':>10}")
+    for mode, scale in (('bulk', args.bulk_scale), ('per-row', args.row_scale)):
+        port = _free_port()
+        api = subprocess.Popen(
+            [sys.executable, '-m', 'benchmarks.fake_api', '--port', str(port), '--scale', str(scale),
+             *(['--bulk'] if mode == 'bulk' else [])],
+            cwd=repo_root, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        try:
+            api_url = f'http://127.0.0.1:{port}'
+            _wait_ready(f'{api_url}/api/v1', api, 60)
+
+            for path in ('legacy', 'columnar'):
+                result = measure(api_url, path)
+                print(
+                    f"{f'{mode} {scale:g}x':<14} {path:<9} {result['seconds']:>7.2f}s "
+                    f"{result['peak_kib'] / 1024:>13.1f}MiB {result['frame_kib'] / 1024:>7.1f}MiB"
+                )
+        finally:
+            api.terminate()
+            api.wait()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,296 @@
+"""Concurrent users against the Dash callback endpoints under gunicorn, with latency percentiles per callback
+
+Starts the fake API and gunicorn with a throwaway config and snapshot directory, unless --server-url
+points at a dashboard that is already running.
+
+    python -m benchmarks.load_test --users 16 --duration 30 --workers 4
+    python -m benchmarks.load_test --server-url http://localhost:8050 --users 8
+"""
+import argparse
+import os
+import random
+import re
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict
+from typing import Iterator
+from typing import List
+from typing import Optional
+from typing import Tuple
+
+import numpy as np
+import requests
+
+repo_root = Path(__file__).parent.parent
+
+# Relative weights of the interactions a simulated user performs
+actions = {
+    'select': 4,   # Dataset, view or year range change, the figures are rendered or served from the cache
+    'restyle': 3,  # Graph type toggle on the same data
+    'zoom': 2,     # Zoom into a General view graph
+}
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def _wait_ready(url: str, process: Optional[subprocess.Popen], timeout: float) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process is not None and process.poll() is not None:
+            raise RuntimeError(f"{process.args[0]} exited with status {process.returncode}")
+        try:
+            if requests.get(url, timeout=1).status_code < 500:
+                return
+        except requests.RequestException:
+            pass
+        time.sleep(0.2)
+    raise TimeoutError(f"{url} did not come up within {timeout:.0f}s")
+
+
+@contextmanager
+def local_stack(args: argparse.Namespace) -> Iterator[str]:
+    # The fake API and gunicorn, with config and snapshot kept out of the working tree.
+    # Rows come embedded in the index responses, dataset ingestion is not what is being measured
+    directory = Path(tempfile.mkdtemp(prefix='load-test-'))
+    (directory / 'app_config.toml').write_text(
+        f'[refresh]\ninterval = 0\n\n[cache]\nbackend = "{args.cache_backend}"\n'
+    )
+    api_port, app_port = _free_port(), _free_port()
+    env = {
+        **os.environ,
+        'APP_CONFIG_FILE': str(directory / 'app_config.toml'),
+        'BACKEND_SERVER_URL': f'http://127.0.0.1:{api_port}',
+    }
+
+    processes = []
+    try:
+        processes.append(subprocess.Popen(
+            [sys.executable, '-m', 'benchmarks.fake_api', '--port', str(api_port),
+             '--scale', str(args.scale), '--latency', str(args.api_latency), '--bulk'],
+            cwd=repo_root, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        ))
+        _wait_ready(f'http://127.0.0.1:{api_port}/api/v1', processes[-1], 60)
+
+        processes.append(subprocess.Popen(
+            ['gunicorn', '--bind', f'127.0.0.1:{app_port}', '--workers', str(args.workers),
+             '--threads', str(args.threads), 'app.main:server'],
+            cwd=repo_root, env=env,
+        ))
+        _wait_ready(f'http://127.0.0.1:{app_port}/readyz', processes[-1], 300)
+
+        yield f'http://127.0.0.1:{app_port}'
+    finally:
+        for process in reversed(processes):
+            process.terminate()
+            process.wait()
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def _find(component, component_id: str) -> Optional[dict]:
+    # Depth-first search of the serialized layout for a component by id
+    if isinstance(component, list):
+        return next(filter(None, (_find(child, component_id) for child in component)), None)
+    if not isinstance(component, dict):
+        return None
+    if component.get('props', {}).get('id') == component_id:
+        return component
+    return _find(component.get('props', {}).get('children'), component_id)
+
+
+class User:
+    def __init__(self, url: str, callbacks: List[dict], year_ranges: Dict[str, list], seed: int) -> None:
+        self.url = url
+        self.callbacks = callbacks
+        self.year_ranges = year_ranges
+        self.random = random.Random(seed)
+        self.session = requests.Session()
+        self.values = {'store-graph-width.data': 800}
+        self.rendered = {}
+
+    def post(self, callback: dict, changed: str) -> requests.Response:
+        outputs = [
+            dict(zip(('id', 'property'), output.rsplit('.', 1)))
+            for output in callback['output'].strip('.').split('...')
+        ]
+        response = self.session.post(f'{self.url}/_dash-update-component', json={
+            'output': callback['output'],
+            # A callback with a single output gets it on its own rather than in a list
+            'outputs': outputs if callback['output'].startswith('..') else outputs[0],
+            'inputs': [{**i, 'value': self.values.get(f"{i['id']}.{i['property']}")} for i in callback['inputs']],
+            'state': [
+                {**s, 'value': self.rendered.get(f"{s['id']}.{s['property']}")} for s in callback['state']
+            ],
+            'changedPropIds': [changed],
+        }, timeout=60)
+
+        # Keep what the server stored, later requests of this user send it back as State
+        if response.status_code == 200:
+            for component_id, props in response.json().get('response', {}).items():
+                for prop, value in props.items():
+                    if component_id.startswith('store-'):
+                        self.rendered[f'{component_id}.{prop}'] = value
+        return response
+
+    def step(self) -> Optional[Tuple[str, str]]:
+        action = self.random.choices(list(actions), weights=list(actions.values()))[0]
+        values = self.values
+
+        if action == 'select' or 'store-selection.data' not in values:
+            dataset = self.random.choice(list(self.year_ranges))
+            years = self.year_ranges[dataset]
+            start = self.random.randrange(len(years))
+            view = self.random.choice(['general', 'compose'])
+            # What the clientside range callbacks store once the dataset and years are picked
+            values.update({
+                'store-selection.data': {
+                    'dataset': dataset, 'start': years[start], 'end': years[self.random.randrange(start, len(years))],
+                },
+                'ctl-view-mode-sel.value': view,
+                'ctl-value-graph-type.value': 'line',
+                'ctl-trends-graph-type.value': 'bar' if view == 'general' else 'heatmap',
+                'store-graph-zoom.data': None,
+            })
+            return 'select', 'store-selection.data'
+
+        if action == 'restyle':
+            values['ctl-value-graph-type.value'] = 'bar' if values['ctl-value-graph-type.value'] == 'line' else 'line'
+            return 'restyle', 'ctl-value-graph-type.value'
+
+        if values['ctl-view-mode-sel.value'] != 'general':
+            return None
+
+        start, end = values['store-selection.data']['start'], values['store-selection.data']['end']
+        zoom_start = self.random.randint(start, end)
+        values['store-graph-zoom.data'] = {
+            'xaxis.range[0]': f'{zoom_start:04d}-01-01',
+            'xaxis.range[1]': f'{min(zoom_start + self.random.randint(1, 10), end):04d}-12-31',
+        }
+        return 'zoom', 'store-graph-zoom.data'
+
+
+def run_user(user: User, deadline: float, think: float, samples: Dict[str, list], errors: Dict[str, int]) -> None:
+    while time.monotonic() < deadline:
+        if (step := user.step()) is None:
+            continue
+        action, changed = step
+
+        for callback in user.callbacks:
+            if changed not in {f"{i['id']}.{i['property']}" for i in callback['inputs']}:
+                continue
+
+            label = f"{callback['name']}:{action}"
+            start = time.perf_counter()
+            try:
+                status = user.post(callback, changed).status_code
+            except requests.RequestException:
+                status = None
+            elapsed = time.perf_counter() - start
+
+            # 204 is a PreventUpdate, a valid answer that updates nothing
+            if status in (200, 204):
+                samples[label].append(elapsed)
+            else:
+                errors[label] += 1
+
+        if think:
+            time.sleep(user.random.expovariate(1 / think))
+
+
+def load_test(url: str, users: int, duration: float, think: float) -> None:
+    session = requests.Session()
+    # Every worker loads the datasets on its own, the one that answered /readyz may not serve the layout
+    for _ in range(600):
+        start = time.perf_counter()
+        layout = session.get(f'{url}/_dash-layout', timeout=60).json()
+        page_load = time.perf_counter() - start
+        if _find(layout, 'store-year-ranges')['props']['data']:
+            break
+        time.sleep(0.1)
+    dependencies = session.get(f'{url}/_dash-dependencies', timeout=60).json()
+
+    callbacks = [
+        {**dependency, 'name': dependency['output'].strip('.').split('...')[0].rsplit('.', 1)[0]}
+        for dependency in dependencies if not dependency.get('clientside_function')
+    ]
+    year_ranges = _find(layout, 'store-year-ranges')['props']['data']
+
+    samples, errors = defaultdict(list), defaultdict(int)
+    deadline = time.monotonic() + duration
+    threads = [
+        threading.Thread(
+            target=run_user, args=(User(url, callbacks, year_ranges, seed), deadline, think, samples, errors),
+        )
+        for seed in range(users)
+    ]
+    wall_start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - wall_start
+
+    print(f"\n{users} users for {wall:.1f}s against {url}, layout fetched in {page_load * 1e3:.0f} ms")
+    print(f"{'callback':<40} {'requests':>9} {'errors':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'req/s':>8}")
+    for label in sorted(set(samples) | set(errors)):
+        latencies = np.array(samples[label]) * 1e3
+        p50, p95, p99 = np.percentile(latencies, [50, 95, 99]) if len(latencies) else (np.nan,) * 3
+        print(
+            f"{label:<40} {len(latencies):>9} {errors[label]:>7} "
+            f"{p50:>9.1f} {p95:>9.1f} {p99:>9.1f} {len(latencies) / wall:>8.1f}"
+        )
+
+    total = sum(len(latencies) for latencies in samples.values())
+    print(f"{'total':<40} {total:>9} {sum(errors.values()):>7} {'':>29} {total / wall:>8.1f}")
+
+    # Merged across workers when the server runs under gunicorn.conf.py
+    lookups = {
+        result: float(value) for result, value in re.findall(
+            r'^figure_cache_lookups_total\{result="(\w+)"\} (\S+)$', session.get(f'{url}/metrics', timeout=60).text,
+            flags=re.MULTILINE,
+        )
+    }
+    if sum(lookups.values()):
+        print(
+            f"figure cache: {lookups.get('hit', 0):.0f} hits, {lookups.get('miss', 0):.0f} misses "
+            f"({lookups.get('hit', 0) / sum(lookups.values()):.0%} hit rate)"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--server-url', help="Test a running dashboard instead of starting one")
+    parser.add_argument('--users', type=int, default=8, help="Concurrent simulated users")
+    parser.add_argument('--duration', type=float, default=30, help="Seconds to run for")
+    parser.add_argument('--think', type=float, default=0.0, help="Mean seconds a user waits between interactions")
+    parser.add_argument('--workers', type=int, default=2, help="gunicorn worker processes")
+    parser.add_argument('--threads', type=int, default=1, help="gunicorn threads per worker")
+    parser.add_argument('--scale', type=float, default=1, help="Fake API dataset history, in multiples of today's")
+    parser.add_argument('--cache-backend', default='auto', help="Figure cache: auto, memory, sqlite or redis")
+    parser.add_argument('--api-latency', type=float, default=0.0, help="Seconds the fake API adds to every response")
+    args = parser.parse_args()
+
+    if args.server_url:
+        load_test(args.server_url.rstrip('/'), args.users, args.duration, args.think)
+        return
+
+    if shutil.which('gunicorn') is None:
+        sys.exit("gunicorn not found, install it or pass --server-url")
+
+    with local_stack(args) as url:
+        load_test(url, args.users, args.duration, args.think)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+"""Per-worker dataset memory with private copies vs. a memory-mapped snapshot
+
+    python -m benchmarks.memory_report --scale 100 --workers 1 4 16
+"""
+import argparse
+import multiprocessing
+import tempfile
+from pathlib import Path
+from typing import Dict
+from typing import List
+
+from app.data_snapshot import DataSnapshot
+from benchmarks.synthetic import synthetic_datasets
+
+
+def _smaps_rollup() -> Dict[str, int]:
+    with open('/proc/self/smaps_rollup', 'r') as f:
+        fields = dict(line.split(':', 1) for line in f.read().splitlines()[1:])
+
+    kib = {key: int(value.split()[0]) for key, value in fields.items()}
+    return {'pss': kib['Pss'], 'uss': kib['Private_Clean'] + kib['Private_Dirty']}
+
+
+def _worker(directory: str, mode: str, loaded, measured, results) -> None:
+    if mode != 'none':
+        datasets = DataSnapshot(Path(directory), memory_map=mode == 'mmap').load()
+        # Touch every value, as serving all views eventually would
+        for dataframe in datasets.values():
+            for column in dataframe.columns:
+                dataframe[column].to_numpy().sum()
+
+    loaded.wait()
+    results.put(_smaps_rollup())
+    measured.wait()
+
+
+def measure(directory: str, mode: str, workers: int) -> List[Dict[str, int]]:
+    context = multiprocessing.get_context('fork')
+    loaded, measured = context.Barrier(workers), context.Barrier(workers)
+    results = context.Queue()
+
+    processes = [
+        context.Process(target=_worker, args=(directory, mode, loaded, measured, results))
+        for _ in range(workers)
+    ]
+    for process in processes:
+        process.start()
+    samples = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+
+    return samples
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scale', type=float, default=100, help="History length relative to the live datasets")
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 4, 16])
+    args = parser.parse_args()
+
+    datasets = synthetic_datasets(args.scale, derived=False)
+    data_bytes = sum(dataframe.memory_usage(deep=True).sum() for dataframe in datasets.values())
+    print(f"Synthetic datasets at {args.scale:g}x: {data_bytes / 2 ** 20:.1f} MiB in memory\n")
+
+    with tempfile.TemporaryDirectory() as directory:
+        DataSnapshot(Path(directory) / 'snapshot').save(datasets, {'datasets': list(datasets)})
+        directory = str(Path(directory) / 'snapshot')
+
+        print(f"{'workers':>7} {'mode':>5} {'USS/worker':>11} {'overhead/worker':>16} {'total PSS':>10}")
+        for workers in args.workers:
+            baseline = measure(directory, 'none', workers)
+            baseline_uss = sum(sample['uss'] for sample in baseline) / workers
+
+            for mode in ('copy', 'mmap'):
+                samples = measure(directory, mode, workers)
+                uss = sum(sample['uss'] for sample in samples) / workers
+                pss = sum(sample['pss'] for sample in samples)
+                print(
+                    f"{workers:>7} {mode:>5} {uss / 1024:>8.1f}MiB "
+                    f"{(uss - baseline_uss) / 1024:>13.1f}MiB {pss / 1024:>7.1f}MiB"
+                )
+
+
+if __name__ == '__main__':
+    main()
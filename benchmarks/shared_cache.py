@@ -0,0 +1,92 @@
+"""Figure cache shared by worker processes vs. one cache per process: renders, hit rate and time when several
+workers take requests for the same figures at once, as gunicorn spreads them round-robin
+
+Each worker creates its cache after the fork, as a gunicorn worker does on import, over the directory that
+gunicorn.conf.py hands every worker in FIGURE_CACHE_DIR. Each worker asks for every figure of every dataset and view,
+in its own order.
+
+    python -m benchmarks.shared_cache --workers 4 --scale 100
+"""
+import argparse
+import multiprocessing
+import random
+import shutil
+import tempfile
+import time
+from pathlib import Path
+
+from app.figure_cache import create_figure_cache
+from app.figure_json import dumps
+from app.graph_helper import typed_array_length
+from benchmarks.bench_payload import graph_func_map
+from benchmarks.bench_payload import graph_types
+from benchmarks.synthetic import synthetic_datasets
+
+
+def _worker(backend: str, directory: Path, datasets, requests, seed: int, renders, lookups, barrier) -> None:
+    cache = create_figure_cache(backend, directory=str(directory), max_bytes=2 ** 30)
+    requests = random.Random(seed).sample(requests, len(requests))
+    barrier.wait()
+
+    for dataset, view, value_graph_type, trends_graph_type in requests:
+        def render():
+            with renders.get_lock():
+                renders.value += 1
+            figures = graph_func_map[dataset, view](datasets[dataset], value_graph_type, trends_graph_type)
+            return [
+                (dumps(figure), len(figure['data']), sum(typed_array_length(trace['y']) for trace in figure['data']))
+                for figure in figures
+            ]
+
+        rendered = cache.get_or_compute('synthetic', (dataset, view, value_graph_type, trends_graph_type), render)
+        assert rendered and all(serialized for serialized, _, _ in rendered)
+        with lookups.get_lock():
+            lookups.value += 1
+
+
+def run(backend: str, workers: int, scale: float, directory: Path) -> None:
+    context = multiprocessing.get_context('fork')
+    datasets = synthetic_datasets(scale)
+    requests = [
+        (dataset, view, value_graph_type, trends_graph_type)
+        for dataset, view in graph_func_map
+        for value_graph_type, trends_graph_type in graph_types[view]
+    ]
+
+    renders, lookups, barrier = context.Value('i', 0), context.Value('i', 0), context.Barrier(workers + 1)
+    processes = [
+        context.Process(target=_worker, args=(backend, directory, datasets, requests, seed, renders, lookups, barrier))
+        for seed in range(workers)
+    ]
+    for process in processes:
+        process.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for process in processes:
+        process.join()
+        assert process.exitcode == 0, process.exitcode
+    seconds = time.perf_counter() - start
+
+    print(
+        f"{backend:<8} {workers:>7} {len(requests):>8} {lookups.value:>8} {renders.value:>8} "
+        f"{1 - renders.value / lookups.value:>8.0%} {seconds:>8.2f}s"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--scale', type=float, default=100, help="History length of the synthetic datasets")
+    args = parser.parse_args()
+
+    print(f"{'backend':<8} {'workers':>7} {'figures':>8} {'lookups':>8} {'renders':>8} {'hits':>8} {'time':>9}")
+    for backend in ('memory', 'sqlite'):
+        directory = Path(tempfile.mkdtemp(prefix='shared-cache-'))
+        try:
+            run(backend, args.workers, args.scale, directory)
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+"""Time from launching gunicorn until it accepts connections, and until /readyz reports the datasets loaded
+
+    python -m benchmarks.startup_time --runs 3 --api-latency 0.002
+    python -m benchmarks.startup_time --backend-down    # listen time with no API server to load from
+"""
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Optional
+
+import requests
+
+from benchmarks.load_test import _free_port
+from benchmarks.load_test import _wait_ready
+
+repo_root = Path(__file__).parent.parent
+
+
+def _first_response(
+        url: str, process: subprocess.Popen, start: float, timeout: float, status: Optional[int] = None,
+) -> float:
+    # Seconds from `start` until `url` answers at all, or answers with `status` when given
+    while time.perf_counter() - start < timeout:
+        if process.poll() is not None:
+            raise RuntimeError(f"gunicorn exited with status {process.returncode}")
+        try:
+            response = requests.get(url, timeout=1)
+        except requests.RequestException:
+            response = None
+
+        if response is not None and (status is None or response.status_code == status):
+            return time.perf_counter() - start
+        time.sleep(0.01)
+    raise TimeoutError(f"{url} did not answer within {timeout:.0f}s")
+
+
+def measure(api_url: str, directory: Path, ready_timeout: float) -> dict:
+    env = {**os.environ, 'APP_CONFIG_FILE': str(directory / 'app_config.toml'), 'BACKEND_SERVER_URL': api_url}
+    port = _free_port()
+
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        ['gunicorn', '--bind', f'127.0.0.1:{port}', '--workers', '1', 'app.main:server'],
+        cwd=repo_root, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        listen = _first_response(f'http://127.0.0.1:{port}/healthz', process, start, 120)
+        try:
+            ready = _first_response(f'http://127.0.0.1:{port}/readyz', process, start, ready_timeout, status=200)
+        except TimeoutError:
+            ready = None
+    finally:
+        process.terminate()
+        process.wait()
+
+    return {'listen': listen, 'ready': ready}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=3)
+    parser.add_argument('--scale', type=float, default=1, help="Fake API dataset history, in multiples of today's")
+    parser.add_argument('--api-latency', type=float, default=0.002, help="Seconds the fake API adds to every response")
+    parser.add_argument('--warm', action='store_true', help="Keep the dataset snapshot between runs")
+    parser.add_argument('--backend-down', action='store_true', help="Point the app at a closed port")
+    parser.add_argument('--ready-timeout', type=float, default=120)
+    args = parser.parse_args()
+
+    if shutil.which('gunicorn') is None:
+        sys.exit("gunicorn not found")
+
+    directory = Path(tempfile.mkdtemp(prefix='startup-time-'))
+    (directory / 'app_config.toml').write_text('[refresh]\ninterval = 0\n')
+    api = None
+    try:
+        if args.backend_down:
+            api_url = f'http://127.0.0.1:{_free_port()}'
+        else:
+            api_port = _free_port()
+            api_url = f'http://127.0.0.1:{api_port}'
+            api = subprocess.Popen(
+                [sys.executable, '-m', 'benchmarks.fake_api', '--port', str(api_port),
+                 '--scale', str(args.scale), '--latency', str(args.api_latency)],
+                cwd=repo_root, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+            )
+            _wait_ready(f'{api_url}/api/v1', api, 60)
+
+        for run in range(args.runs):
+            if not args.warm:
+                shutil.rmtree(directory / '.snapshot', ignore_errors=True)
+
+            result = measure(api_url, directory, 5 if args.backend_down else args.ready_timeout)
+            ready = f"{result['ready']:.2f}s" if result['ready'] is not None else 'not ready'
+            print(f"run {run + 1}: listening after {result['listen']:.2f}s, ready after {ready}")
+    finally:
+        if api is not None:
+            api.terminate()
+            api.wait()
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
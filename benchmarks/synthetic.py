@@ -0,0 +1,80 @@
+from typing import Dict
+
+import numpy as np
+import pandas as pd
+
+from app.data_schema import materialize_columns
+from app.data_schema import prepare_dataset
+from app.data_schema import schemas
+
+__all__ = ['synthetic_datasets']
+
+# Approximate history length of the live datasets
+BASE_YEARS = {
+    'housing_data': 30,
+    'travel_data': 15,
+    'lm_data': 30,
+}
+
+
+def _housing(years: np.ndarray, rng: np.random.Generator) -> pd.DataFrame:
+    year, month = np.repeat(years, 12), np.tile(np.arange(1, 13), len(years))
+    cycle = np.sin(np.arange(len(year)) * 2 * np.pi / 216)
+    value_ldn = 4.5e5 * (1 + 0.3 * cycle) * rng.normal(1, 0.01, len(year))
+    value_uk = 2.5e5 * (1 + 0.2 * cycle) * rng.normal(1, 0.01, len(year))
+
+    return pd.DataFrame({
+        'year': year,
+        'month': month,
+        'value_ldn': value_ldn,
+        'value_uk': value_uk,
+        'annual_growth_ldn': pd.Series(value_ldn).pct_change(12),
+        'annual_growth_uk': pd.Series(value_uk).pct_change(12),
+    })
+
+
+def _travel(years: np.ndarray, rng: np.random.Generator) -> pd.DataFrame:
+    year, period = np.repeat(years, 13), np.tile(np.arange(1, 14), len(years))
+    bus = rng.normal(1.8e8, 1.5e7, len(year))
+    tube = rng.normal(1.0e8, 1.0e7, len(year))
+
+    return pd.DataFrame({
+        'year': year,
+        'period': period,
+        'bus_journeys': bus,
+        'tube_journeys': tube,
+    })
+
+
+def _lm(years: np.ndarray, rng: np.random.Generator) -> pd.DataFrame:
+    year, month = np.repeat(years, 12), np.tile(np.arange(1, 13), len(years))
+
+    return pd.DataFrame({
+        'year': year,
+        'month': month,
+        'unemployment_rate_ldn': np.clip(rng.normal(6.5, 1.2, len(year)), 1, None),
+        'unemployment_rate_uk': np.clip(rng.normal(5.5, 1.0, len(year)), 1, None),
+    })
+
+
+def synthetic_datasets(scale: float = 1, seed: int = 0, derived: bool = True) -> Dict[str, pd.DataFrame]:
+    """Preprocessed datasets shaped like the live ones, with `scale` times their history
+
+    With `derived`, every derived column is materialized up front, as the graph helpers expect. Without,
+    the frames are what DataProvider publishes.
+    """
+    rng = np.random.default_rng(seed)
+    builders = {'housing_data': _housing, 'travel_data': _travel, 'lm_data': _lm}
+
+    datasets = {
+        dataset: prepare_dataset(
+            dataset, builder(np.arange(2024 - max(int(BASE_YEARS[dataset] * scale), 1), 2024), rng),
+        )
+        for dataset, builder in builders.items()
+    }
+    if derived:
+        datasets = {
+            dataset: materialize_columns(dataset, dataframe, schemas[dataset]['derived'])
+            for dataset, dataframe in datasets.items()
+        }
+    return datasets
@@ -0,0 +1,119 @@
+"""Bytes transferred for a first page load and a repeat load with a warm browser cache, with and without
+precompressed static files, immutable caching and compressed callback responses
+
+A first load fetches the page, its stylesheets and scripts, the async chunks and plotly.js the graphs load, the
+font and logo, and renders the first dataset. A repeat load skips whatever the first responses allowed the browser
+to cache outright, and revalidates what carries an ETag. Each mode runs in a fresh process against synthetic data.
+
+    python -m benchmarks.transfer_size --scale 10
+"""
+import argparse
+import multiprocessing
+import re
+import shutil
+import tempfile
+from pathlib import Path
+from typing import Dict
+from typing import List
+
+browser_headers = {'Accept-Encoding': 'gzip, deflate, br'}
+async_chunks = ('graph', 'dropdown', 'slider', 'markdown')
+
+
+def _static_urls(main, client) -> List[str]:
+    import plotly
+    from dash.fingerprint import build_fingerprint
+
+    page = client.get('/').get_data(as_text=True)
+    urls = re.findall(r'(?:src|href)="(/[^"]+)"', page)
+
+    # The dcc chunks carry the fingerprint of their bundle, plotly.js one of its own
+    dcc_fingerprint = next(re.search(r'\.(v[^.]+m\d+)\.', url).group(1) for url in urls if '/dcc/' in url)
+    urls += [f'/_dash-component-suites/dash/dcc/async-{chunk}.{dcc_fingerprint}.js' for chunk in async_chunks]
+    plotly_js = Path(plotly.__file__).parent / 'package_data' / 'plotly.min.js'
+    urls.append('/_dash-component-suites/plotly/' + build_fingerprint(
+        'package_data/plotly.min.js', plotly.__version__, int(plotly_js.stat().st_mtime),
+    ))
+
+    # The logo is linked from the layout, the font from the stylesheet
+    layout = client.get('/_dash-layout').get_data(as_text=True)
+    urls += re.findall(r'"(/assets/[^"]+)"', layout)
+    stylesheet = (Path(main.app.config.assets_folder) / 'app.css').read_text()
+    urls += [f'/assets/{name}' for name in re.findall(r'url\("?([^")]+)"?\)', stylesheet)]
+    return urls
+
+
+def _load(directory: Path, scale: float, compression: bool, results) -> None:
+    from benchmarks.bench_suite import _graph_requests
+    from benchmarks.bench_suite import _offline_app
+
+    main = _offline_app(directory, scale, f'\n[compression]\nenabled = {str(compression).lower()}\n')
+    if compression:
+        from app.compression import precompress
+        precompress(main.app, directory / '.precompressed')
+
+    client = main.server.test_client()
+    static_urls = _static_urls(main, client)
+    dataset = next(iter(main.data_provider.current.datasets))
+    render, _ = _graph_requests(main, dataset, 'general', 'line', 'line', headers=browser_headers)['render']
+
+    totals = {'first': {}, 'repeat': {}}
+    for load in totals:
+        for category in ('page', 'static', 'callback'):
+            totals[load][category] = [0, 0]
+
+    cached = {}
+    for load in ('first', 'repeat'):
+        def count(category: str, response) -> None:
+            totals[load][category][0] += 1
+            totals[load][category][1] += len(response.get_data())
+
+        for url in ('/', '/_dash-layout', '/_dash-dependencies'):
+            count('page', client.get(url, headers=browser_headers))
+
+        for url in static_urls:
+            cache_control, etag = cached.get(url, ('', None))
+            if 'max-age' in cache_control and 'no-cache' not in cache_control:
+                continue
+            response = client.get(url, headers={**browser_headers, **({'If-None-Match': etag} if etag else {})})
+            assert response.status_code in (200, 304), (url, response.status_code)
+            if response.status_code == 200:
+                cached[url] = (response.headers.get('Cache-Control', ''), response.headers.get('ETag'))
+            count('static', response)
+
+        count('callback', render())
+        main.figure_cache.clear()
+
+    results.put(totals)
+
+
+def measure(scale: float, compression: bool) -> Dict[str, Dict[str, list]]:
+    directory = Path(tempfile.mkdtemp(prefix='transfer-size-'))
+    try:
+        context = multiprocessing.get_context('spawn')
+        results = context.Queue()
+        process = context.Process(target=_load, args=(directory, scale, compression, results))
+        process.start()
+        result = results.get()
+        process.join()
+        return result
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scale', type=float, default=10, help="History length of the synthetic datasets")
+    args = parser.parse_args()
+
+    print(f"{'mode':<13} {'load':<7}" + ''.join(f"{category:>24}" for category in ('page', 'static', 'callback'))
+          + f"{'total':>16}")
+    for compression in (False, True):
+        for load, categories in measure(args.scale, compression).items():
+            cells = ''.join(f"{requests:>6} req {size:>13,} B" for requests, size in categories.values())
+            total = sum(size for _, size in categories.values())
+            print(f"{'compressed' if compression else 'uncompressed':<13} {load:<7}{cells}{total:>14,} B")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+"""Points per figure, serialized size and build time of the line graphs, and whether they are drawn as SVG or WebGL
+at a threshold, for the full range of every dataset and view
+
+The General view is measured as the app serves it, downsampled to the point budget of a graph of the given width,
+and without downsampling. Every figure is also built with WebGL forced on and checked to differ from its SVG
+build only in trace type, so hover, legend and styling stay the same.
+
+    python -m benchmarks.webgl_threshold --scales 1 10 100 --threshold 5000
+"""
+import argparse
+import timeit
+
+from app.figure_json import dumps
+from app.graph_helper import compose_graph_columns
+from app.graph_helper import downsample_rows
+from app.graph_helper import general_graph_columns
+from app.graph_helper import typed_array_length
+from benchmarks.bench_payload import graph_func_map
+from benchmarks.synthetic import synthetic_datasets
+
+
+def _without_types(figures) -> list:
+    return [
+        {**figure, 'data': [{key: value for key, value in trace.items() if key != 'type'} for trace in figure['data']]}
+        for figure in figures
+    ]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scales', type=float, nargs='+', default=[1, 10, 100])
+    parser.add_argument('--threshold', type=int, default=5000, help="Points per figure past which lines use WebGL")
+    parser.add_argument('--graph-width', type=int, default=1000, help="Pixels, sets the General view point budget")
+    parser.add_argument('--points-per-pixel', type=float, default=2)
+    args = parser.parse_args()
+    graph_columns = {**general_graph_columns, **compose_graph_columns}
+    max_points = max(int(round(args.graph_width * args.points_per_pixel, -2)), 100)
+
+    print(f"{'case':<38} {'traces':>7} {'points':>9} {'bytes':>12} {'build':>10}  {'at threshold':<12}")
+    for scale in args.scales:
+        datasets = synthetic_datasets(scale)
+        for (dataset, view), graph_func in graph_func_map.items():
+            variants = {'full': datasets[dataset]}
+            if view == 'general':
+                variants['downsampled'] = downsample_rows(
+                    datasets[dataset], max_points, 'lttb', graph_columns[graph_func],
+                )
+
+            for variant, dataframe in variants.items():
+                figure = graph_func(dataframe, 'line', 'line', args.threshold)[0]
+                webgl = graph_func(dataframe, 'line', 'line', 0)
+                svg = graph_func(dataframe, 'line', 'line', None)
+                assert _without_types(webgl) == _without_types(svg), (dataset, view)
+
+                seconds = min(timeit.repeat(
+                    lambda: graph_func(dataframe, 'line', 'line', args.threshold), number=3, repeat=3,
+                )) / 3
+                points = sum(typed_array_length(trace['y']) for trace in figure['data'])
+                print(
+                    f"{f'{scale:g}x/{dataset}/{view}/{variant}':<38} {len(figure['data']):>7} {points:>9,} "
+                    f"{len(dumps(figure)):>12,} {seconds * 1e3:>8.2f}ms  "
+                    f"{'WebGL' if figure['data'][0]['type'] == 'scattergl' else 'SVG':<12}"
+                )
+
+
+if __name__ == '__main__':
+    main()
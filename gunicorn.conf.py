@@ -0,0 +1,28 @@
+import os
+import tempfile
+from pathlib import Path
+
+# Workers write their metrics to files in this directory, so /metrics on any worker reports all of them.
+# It must be set before the app imports prometheus_client, and emptied of samples left by a previous run
+metrics_dir = Path(os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', tempfile.mkdtemp(prefix='prometheus-')))
+for path in metrics_dir.glob('*.db'):
+    path.unlink()
+
+# Workers share rendered figures through a cache in this directory. Entries are keyed by dataset content only,
+# so ones left by a previous run, possibly of other code, are removed
+figure_cache_dir = Path(os.environ.setdefault('FIGURE_CACHE_DIR', tempfile.mkdtemp(prefix='figure-cache-')))
+for path in figure_cache_dir.glob('figures.*'):
+    path.unlink()
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+
+    multiprocess.mark_process_dead(worker.pid)
+
+
+def post_worker_init(worker):
+    # Start loading the datasets as soon as the worker is up, rather than on its first request
+    from app.data_provider import data_provider
+
+    data_provider.start()
@@ -0,0 +1,60 @@
+import shutil
+
+import pytest
+
+from benchmarks.callback_graph import Replay
+from benchmarks.callback_graph import _interactions
+
+pytestmark = pytest.mark.skipif(shutil.which('node') is None, reason="clientside callbacks run in node")
+
+
+@pytest.fixture(scope='module')
+def replay(tmp_path_factory):
+    from benchmarks.bench_suite import _offline_app
+
+    replay = Replay(_offline_app(tmp_path_factory.mktemp('callback-graph'), 1))
+    yield replay
+    replay.close()
+
+
+@pytest.fixture(scope='module')
+def interactions(replay):
+    # Replayed in order, each one starts from the props the previous ones left
+    return {name: replay.run(change()) for name, change in _interactions(replay)}
+
+
+def test_no_callback_feeds_its_own_inputs(replay):
+    # The year dropdowns used to be inputs and outputs of one callback, each selection requested it again
+    for index, callback in enumerate(replay.callbacks):
+        assert not replay.downstream(index) & set(callback['input_props']), callback['name']
+
+
+def test_each_interaction_runs_a_callback_and_renders_at_most_once(interactions):
+    columns = {'clientside calls', 'server calls', 'figure responses', 'renders'}
+    for name, counts in interactions.items():
+        assert counts['renders'] <= 1, name
+        assert all(count == 1 for callback, count in counts.items() if callback not in columns), (name, counts)
+
+
+def test_selections_render_once(interactions):
+    for name in ("page load", "select dataset", "select start year", "select end year", "select view"):
+        assert interactions[name]['renders'] == 1, name
+    assert interactions["select graph type"]['renders'] == 0
+
+
+def test_autosize_stays_clientside(interactions):
+    assert interactions["plotly autosize"]['server calls'] == 0
+
+
+def test_zoom_sends_no_figure(interactions):
+    # No range of today's history is downsampled, the figure already holds every point
+    assert interactions["zoom"]['figure responses'] == 0
+    assert interactions["zoom"]['renders'] == 0
+
+
+def test_zoom_into_a_downsampled_range_renders_the_window(replay, interactions, monkeypatch):
+    monkeypatch.setitem(replay.main.downsample_config, 'points_per_pixel', 0.1)
+    zoom = dict(_interactions(replay))["zoom"]
+
+    counts = replay.run(zoom())
+    assert (counts['server calls'], counts['figure responses'], counts['renders']) == (1, 1, 1)
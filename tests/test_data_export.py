@@ -0,0 +1,58 @@
+import csv
+import io
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app import data_export
+from app.data_export import iter_export
+from app.data_schema import materialize_columns
+from app.data_schema import schemas
+from benchmarks.synthetic import synthetic_datasets
+
+
+@pytest.fixture(params=['orjson', 'pandas'])
+def encoder(request, monkeypatch):
+    if request.param == 'pandas':
+        monkeypatch.setattr(data_export, 'orjson', None)
+    elif data_export.orjson is None:
+        pytest.skip("orjson is not installed")
+
+
+def _csv_rows(dataframe: pd.DataFrame, columns, chunk_rows: int) -> list:
+    text = b''.join(iter_export(dataframe, columns, 'csv', chunk_rows)).decode()
+    return [
+        {column: float(value) if value else None for column, value in row.items()}
+        for row in csv.DictReader(io.StringIO(text))
+    ]
+
+
+def _jsonl_rows(dataframe: pd.DataFrame, columns, chunk_rows: int) -> list:
+    text = b''.join(iter_export(dataframe, columns, 'jsonl', chunk_rows)).decode()
+    return [json.loads(line) for line in text.splitlines()]
+
+
+def test_jsonl_writes_float32_values_as_csv_does(encoder):
+    dataframe = pd.DataFrame({
+        'year': np.array([2000, 2001, 2002], dtype=np.int16),
+        'value': np.array([4.2, np.nan, 0.14951344], dtype=np.float32),
+    })
+
+    assert _jsonl_rows(dataframe, ['year', 'value'], 2) == [
+        {'year': 2000, 'value': 4.2}, {'year': 2001, 'value': None}, {'year': 2002, 'value': 0.14951344},
+    ]
+
+
+@pytest.mark.parametrize('dataset', list(schemas))
+def test_jsonl_matches_csv(encoder, dataset):
+    schema = schemas[dataset]
+    columns = [*schema['keys'], *schema['values'], *schema['derived']]
+    dataframe = synthetic_datasets(1, derived=False)[dataset]
+    dataframe = materialize_columns(dataset, dataframe, schema['derived'])
+
+    jsonl = _jsonl_rows(dataframe, columns, 50)
+    assert len(jsonl) == len(dataframe)
+    assert all(list(row) == columns for row in jsonl)
+    assert jsonl == _csv_rows(dataframe, columns, 50)
@@ -0,0 +1,97 @@
+import sqlite3
+import threading
+import time
+
+import pytest
+
+from app import figure_cache
+from app.figure_cache import RedisFigureStore
+from app.figure_cache import SharedFigureCache
+from app.figure_cache import SqliteFigureStore
+
+
+@pytest.fixture
+def redis_url(monkeypatch):
+    fakeredis = pytest.importorskip('fakeredis')
+    server = fakeredis.FakeServer()
+    monkeypatch.setattr('redis.Redis.from_url', lambda url: fakeredis.FakeRedis(server=server))
+    return 'redis://fake'
+
+
+@pytest.fixture(params=['sqlite', 'redis'])
+def new_store(request, tmp_path):
+    # Stores opened by one call each stand for a worker sharing the others' entries
+    if request.param == 'sqlite':
+        return lambda: SqliteFigureStore(tmp_path)
+    url = request.getfixturevalue('redis_url')
+    return lambda: RedisFigureStore(url, lock_timeout=0.2)
+
+
+def test_entries_are_shared_between_workers(new_store):
+    first, second = SharedFigureCache(new_store()), SharedFigureCache(new_store())
+
+    assert first.get_or_compute(1, 'key', lambda: {'figure': [1, 2]}) == {'figure': [1, 2]}
+    assert second.get_or_compute(1, 'key', lambda: pytest.fail("computed twice")) == {'figure': [1, 2]}
+    assert second.get_or_compute(2, 'key', lambda: 'new version') == 'new version'
+    assert (first.misses, second.hits, second.misses) == (1, 1, 1)
+
+
+def test_concurrent_misses_compute_once(new_store):
+    calls = []
+
+    def compute():
+        calls.append(None)
+        time.sleep(0.05)
+        return 'figure'
+
+    # Threads of a worker share its store, record locks only keep processes apart
+    store = new_store()
+    caches = [SharedFigureCache(store) for _ in range(4)]
+    results = []
+    threads = [
+        threading.Thread(target=lambda cache=cache: results.append(cache.get_or_compute(1, 'key', compute)))
+        for cache in caches
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results == ['figure'] * 4
+    assert len(calls) == 1
+
+
+def test_corrupt_entry_is_a_miss(new_store):
+    cache = SharedFigureCache(new_store())
+    cache.get_or_compute(1, 'key', lambda: 'figure')
+    if isinstance(cache.store, RedisFigureStore):
+        client = figure_cache.redis.Redis.from_url('redis://fake')
+        for key in client.scan_iter('figure:*'):
+            client.set(key, b'not a pickle')
+    else:
+        with sqlite3.connect(cache.store.directory / 'figures.sqlite') as connection:
+            connection.execute("UPDATE figures SET value = x'00'")
+
+    assert cache.get_or_compute(1, 'key', lambda: 'rendered again') == 'rendered again'
+    assert (cache.errors, cache.misses) == (1, 2)
+    assert cache.get_or_compute(1, 'key', lambda: pytest.fail("entry not overwritten")) == 'rendered again'
+
+
+def test_lock_expired_during_render_returns_the_figure(redis_url):
+    cache = SharedFigureCache(RedisFigureStore(redis_url, lock_timeout=0.05))
+
+    def compute():
+        time.sleep(0.2)
+        return 'figure'
+
+    assert cache.get_or_compute(1, 'key', compute) == 'figure'
+    assert cache.errors == 1
+    assert cache.get_or_compute(1, 'key', lambda: pytest.fail("entry not stored")) == 'figure'
+
+
+def test_unreachable_store_still_renders():
+    pytest.importorskip('redis')
+    cache = SharedFigureCache(RedisFigureStore('redis://127.0.0.1:1/0'))
+
+    assert cache.get_or_compute(1, 'key', lambda: 'figure') == 'figure'
+    assert cache.errors == 1